@@ -1,31 +1,58 @@
-import jwt
+import atexit
+import math
+import threading
+import time
+import traceback
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from werkzeug.security import generate_password_hash, check_password_hash
 from flask import request, jsonify, current_app
-from models import User, AdminSession
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, User, AdminSession, resolve_password_method
+from cache import LRUCache
 
-class AuthManager:
-    def __init__(self, app=None):
-        self.app = app
-        if app is not None:
-            self.init_app(app)
+class UserSnapshot:
+    """Cópia somente leitura dos dados do usuário, guardada no cache ou no token de sessão"""
     
-    def init_app(self, app):
-        app.config.setdefault('SECRET_KEY', 'your-secret-key-change-this')
-        app.config.setdefault('SESSION_DURATION_HOURS', 24)
+    def __init__(self, data):
+        self.id = data['id']
+        self.username = data['username']
+        self.email = data['email']
+        self.is_admin = data['is_admin']
+        self.is_active = data['is_active']
+        self._data = dict(data)
     
-    def generate_session_token(self):
-        """Gera um token de sessão único"""
-        return str(uuid.uuid4())
+    @classmethod
+    def from_user(cls, user):
+        """Cria o snapshot a partir de um objeto User"""
+        return cls(user.to_dict())
     
-    def create_session(self, user_id):
-        """Cria uma nova sessão para o usuário"""
-        session_token = self.generate_session_token()
-        expires_at = datetime.utcnow() + timedelta(hours=current_app.config['SESSION_DURATION_HOURS'])
+    def to_dict(self):
+        """Converte o snapshot para dicionário (mesmo formato de User.to_dict)"""
+        return dict(self._data)
+
+class DatabaseSessionBackend:
+    """Sessões opacas (UUID) armazenadas na tabela admin_sessions, com cache por processo"""
+    
+    name = 'database'
+    
+    def __init__(self, app):
+        # O TTL do cache limita o tempo em que uma sessão encerrada em outro
+        # worker ainda pode ser aceita
+        self.cache = LRUCache(
+            max_size=int(app.config['SESSION_CACHE_SIZE']),
+            ttl=int(app.config['SESSION_CACHE_TTL_SECONDS'])
+        )
+    
+    def create(self, user_id, expires_at):
+        """Cria uma nova sessão, desativando as anteriores do usuário"""
+        session_token = str(uuid.uuid4())
         
         # Remove sessões antigas do usuário
-        AdminSession.query.filter_by(user_id=user_id, is_active=True).update({'is_active': False})
+        self.revoke_user(user_id)
         
         # Cria nova sessão
         session = AdminSession(
@@ -39,26 +66,36 @@ class AuthManager:
         
         return session_token
     
-    def validate_session(self, session_token):
-        """Valida um token de sessão"""
-        if not session_token:
-            return None
+    def validate(self, session_token):
+        """Valida um token consultando o cache antes do banco"""
+        user = self.cache.get(session_token)
+        if user is not None:
+            return user
         
-        session = AdminSession.query.filter_by(
+        session = AdminSession.query.options(joinedload(AdminSession.user)).filter_by(
             session_token=session_token,
             is_active=True
         ).first()
         
+        # Sessões expiradas são desativadas em lote pelo sweeper, não aqui
         if not session or session.is_expired():
-            if session:
-                session.is_active = False
-                db.session.commit()
             return None
         
-        return session.user
+        if not session.user or not session.user.is_active:
+            return None
+        
+        user = UserSnapshot.from_user(session.user)
+        
+        # A entrada nunca sobrevive à expiração da própria sessão
+        ttl = min(self.cache.ttl, (session.expires_at - datetime.utcnow()).total_seconds())
+        self.cache.set(session_token, user, ttl=ttl)
+        
+        return user
     
-    def logout_session(self, session_token):
+    def revoke(self, session_token):
         """Encerra uma sessão"""
+        self.cache.delete(session_token)
+        
         session = AdminSession.query.filter_by(
             session_token=session_token,
             is_active=True
@@ -71,17 +108,307 @@ class AuthManager:
         
         return False
     
+    def revoke_user(self, user_id):
+        """Desativa todas as sessões de um usuário (sem commit)"""
+        self.refresh_user(user_id)
+        AdminSession.query.filter_by(user_id=user_id, is_active=True).update({'is_active': False})
+    
+    def refresh_user(self, user_id):
+        """Remove do cache os snapshots do usuário, forçando nova leitura do banco"""
+        self.cache.delete_where(lambda user: user.id == user_id)
+
+# Valores padrão da SECRET_KEY no código (públicos: não servem para assinar tokens)
+DEFAULT_SECRET_KEYS = ('your-secret-key-change-this', 'your-secret-key-change-this-in-production')
+
+class SignedTokenSessionBackend:
+    """
+    Sessões sem estado: o token é um JWT assinado com a SECRET_KEY que carrega
+    a expiração e os dados do usuário, então validar é apenas uma verificação de CPU.
+    
+    A lista de revogação (opcional) é mantida em memória e vale só para o processo
+    atual; ela guarda apenas tokens ainda não expirados, por isso é curta.
+    """
+    
+    name = 'token'
+    algorithm = 'HS256'
+    # Quem conhece a chave emite tokens de qualquer usuário (inclusive administrador)
+    MIN_SECRET_KEY_LENGTH = 32
+    
+    def __init__(self, app):
+        self.secret_key = app.config['SECRET_KEY']
+        if not self.secret_key or self.secret_key in DEFAULT_SECRET_KEYS:
+            raise ValueError('SESSION_BACKEND=token requer uma SECRET_KEY própria (a padrão é pública)')
+        if len(self.secret_key) < self.MIN_SECRET_KEY_LENGTH:
+            raise ValueError(f'SESSION_BACKEND=token requer uma SECRET_KEY com pelo menos '
+                             f'{self.MIN_SECRET_KEY_LENGTH} caracteres')
+        self.revocation_enabled = bool(app.config['SESSION_REVOCATION_LIST'])
+        self.revoked_tokens = LRUCache(max_size=int(app.config['SESSION_REVOCATION_LIST_SIZE']))
+        self.revoked_users = LRUCache(max_size=int(app.config['SESSION_REVOCATION_LIST_SIZE']))
+        self.max_age = timedelta(hours=app.config['SESSION_DURATION_HOURS']).total_seconds()
+    
+    def create(self, user_id, expires_at):
+        """Emite um token assinado para o usuário"""
+        user = User.query.get(user_id)
+        issued_ms = self._timestamp_ms()
+        
+        # Assim como no backend de banco, um novo login encerra os tokens anteriores,
+        # inclusive os emitidos no mesmo segundo (o iat tem precisão de milissegundos)
+        self.revoke_user(user_id, before_ms=issued_ms - 1)
+        
+        payload = {
+            'sub': str(user_id),
+            'jti': uuid.uuid4().hex,
+            'iat': issued_ms / 1000,
+            'exp': expires_at.replace(tzinfo=timezone.utc),
+            'user': user.to_dict()
+        }
+        import jwt  # sob demanda: só este backend usa o PyJWT
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+    
+    @staticmethod
+    def _timestamp_ms():
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
+    
+    def _decode(self, session_token):
+        import jwt
+        try:
+            return jwt.decode(
+                session_token,
+                self.secret_key,
+                algorithms=[self.algorithm],
+                options={'require': ['sub', 'jti', 'iat', 'exp']}
+            )
+        except jwt.InvalidTokenError:
+            return None
+    
+    def validate(self, session_token):
+        """Valida a assinatura, a expiração e a lista de revogação do token"""
+        payload = self._decode(session_token)
+        if not payload or not payload.get('user'):
+            return None
+        
+        if self.revocation_enabled:
+            if self.revoked_tokens.get(payload['jti']) is not None:
+                return None
+            revoked_before = self.revoked_users.get(payload['sub'])
+            if revoked_before is not None and round(payload['iat'] * 1000) <= revoked_before:
+                return None
+        
+        user = UserSnapshot(payload['user'])
+        return user if user.is_active else None
+    
+    def revoke(self, session_token):
+        """Adiciona o token à lista de revogação até a sua expiração"""
+        payload = self._decode(session_token)
+        if not payload:
+            return False
+        
+        if self.revocation_enabled:
+            ttl = payload['exp'] - datetime.now(timezone.utc).timestamp()
+            self.revoked_tokens.set(payload['jti'], True, ttl=max(ttl, 0))
+        return True
+    
+    def revoke_user(self, user_id, before_ms=None):
+        """Revoga todos os tokens do usuário emitidos até agora (ou até before_ms)"""
+        if self.revocation_enabled:
+            before_ms = self._timestamp_ms() if before_ms is None else before_ms
+            previous = self.revoked_users.get(str(user_id))
+            if previous is not None:
+                before_ms = max(before_ms, previous)
+            self.revoked_users.set(str(user_id), before_ms, ttl=self.max_age)
+    
+    def refresh_user(self, user_id):
+        """
+        Os dados do usuário (e a senha que os validou) vivem no próprio token:
+        a única forma de descartá-los é revogar os tokens emitidos até agora
+        """
+        self.revoke_user(user_id)
+
+SESSION_BACKENDS = {
+    DatabaseSessionBackend.name: DatabaseSessionBackend,
+    SignedTokenSessionBackend.name: SignedTokenSessionBackend
+}
+
+class AuthManager:
+    def __init__(self, app=None):
+        self.app = app
+        self.backend = None
+        # Últimos logins ainda não gravados: {user_id: datetime}
+        self.pending_logins = {}
+        self._pending_since = None
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('SECRET_KEY', DEFAULT_SECRET_KEYS[0])
+        app.config.setdefault('SESSION_DURATION_HOURS', 24)
+        # Backend de sessões: 'database' (tabela admin_sessions) ou 'token' (JWT assinado)
+        app.config.setdefault('SESSION_BACKEND', 'database')
+        app.config.setdefault('SESSION_CACHE_SIZE', 1024)
+        app.config.setdefault('SESSION_CACHE_TTL_SECONDS', 60)
+        app.config.setdefault('SESSION_REVOCATION_LIST', True)
+        app.config.setdefault('SESSION_REVOCATION_LIST_SIZE', 10000)
+        # Hash de senhas: 'scrypt' ou 'pbkdf2[:digest]' e o custo (iterações ou N do scrypt)
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_ITERATIONS', None)
+        iterations = app.config['PASSWORD_HASH_ITERATIONS']
+        if app.config['PASSWORD_HASH_METHOD'].startswith('scrypt') and iterations and int(iterations) > 1:
+            n = 2 ** round(math.log2(int(iterations)))
+            if n != int(iterations):
+                print(f"PASSWORD_HASH_ITERATIONS={iterations} não é potência de 2; usando N={n} no scrypt")
+                app.config['PASSWORD_HASH_ITERATIONS'] = n
+        # Valida o método na inicialização, não no primeiro login
+        resolve_password_method(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_ITERATIONS'])
+        # Manutenção das sessões: intervalo do sweeper em segundo plano (0 desliga),
+        # dias que sessões expiradas ficam na tabela e atraso máximo do last_login
+        app.config.setdefault('SESSION_SWEEP_INTERVAL_SECONDS', 0)
+        app.config.setdefault('SESSION_RETENTION_DAYS', 7)
+        app.config.setdefault('LAST_LOGIN_FLUSH_SECONDS', 300)
+        
+        self.app = app
+        atexit.register(self._flush_at_exit)
+        
+        backend_class = SESSION_BACKENDS.get(app.config['SESSION_BACKEND'])
+        if backend_class is None:
+            raise ValueError(f"SESSION_BACKEND inválido: {app.config['SESSION_BACKEND']}")
+        
+        self.backend = backend_class(app)
+    
+    def invalidate_user_sessions(self, user_id):
+        """Descarta os dados em cache das sessões de um usuário, ou seus tokens (ex.: após trocar a senha)"""
+        self.backend.refresh_user(user_id)
+    
+    def create_session(self, user_id):
+        """Cria uma nova sessão para o usuário"""
+        expires_at = datetime.utcnow() + timedelta(hours=current_app.config['SESSION_DURATION_HOURS'])
+        
+        if self.backend.name == 'database':
+            # Os últimos logins pendentes entram no mesmo commit da nova sessão
+            self.flush_logins(commit=False)
+        elif self._sweeper is None or self._login_flush_due():
+            # Sem sweeper não há quem grave o lote depois (instâncias serverless raramente
+            # chegam ao próximo login ou ao atexit): grava já
+            self.flush_logins()
+        
+        return self.backend.create(user_id, expires_at)
+    
+    def _login_flush_due(self):
+        """Se o último login pendente mais antigo já passou de LAST_LOGIN_FLUSH_SECONDS"""
+        return self._pending_since is not None and \
+            (datetime.utcnow() - self._pending_since).total_seconds() > current_app.config['LAST_LOGIN_FLUSH_SECONDS']
+    
+    def validate_session(self, session_token):
+        """Valida um token de sessão"""
+        if not session_token:
+            return None
+        
+        return self.backend.validate(session_token)
+    
+    def logout_session(self, session_token):
+        """Encerra uma sessão"""
+        return self.backend.revoke(session_token)
+    
     def authenticate_user(self, username, password):
         """Autentica um usuário"""
         user = User.query.filter_by(username=username, is_active=True).first()
         
         if user and user.check_password(password):
-            # Atualiza último login
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            # Regrava o hash com os parâmetros atuais (a senha em texto só existe aqui)
+            if user.needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+            
+            self.record_login(user)
             return user
         
         return None
+    
+    def record_login(self, user):
+        """
+        Registra o último login sem um commit próprio.
+        
+        O valor aparece no objeto imediatamente; a gravação é feita junto com o
+        commit da nova sessão (backend database) ou, no backend token, em lote pelo
+        sweeper (até LAST_LOGIN_FLUSH_SECONDS depois) ou na hora, se ele está desligado.
+        """
+        now = datetime.utcnow()
+        set_committed_value(user, 'last_login', now)
+        with self._lock:
+            self.pending_logins[user.id] = now
+            self._pending_since = self._pending_since or now
+    
+    def flush_logins(self, commit=True):
+        """Grava os últimos logins pendentes em um único UPDATE em lote"""
+        with self._lock:
+            pending, self.pending_logins = self.pending_logins, {}
+            self._pending_since = None
+        
+        if not pending:
+            return 0
+        
+        db.session.execute(update(User), [
+            {'id': user_id, 'last_login': last_login} for user_id, last_login in pending.items()
+        ])
+        if commit:
+            db.session.commit()
+        return len(pending)
+    
+    def sweep_sessions(self, retention_days=None, batch_size=1000):
+        """
+        Desativa de uma vez as sessões expiradas e apaga, em lotes, as expiradas há
+        mais de retention_days. Também grava os últimos logins pendentes.
+        """
+        if retention_days is None:
+            retention_days = current_app.config['SESSION_RETENTION_DAYS']
+        now = datetime.utcnow()
+        
+        expired = AdminSession.query.filter(
+            AdminSession.is_active == True,
+            AdminSession.expires_at < now
+        ).update({'is_active': False}, synchronize_session=False)
+        db.session.commit()
+        
+        cutoff = now - timedelta(days=retention_days)
+        purged = 0
+        while True:
+            ids = [row[0] for row in db.session.query(AdminSession.id)
+                   .filter(AdminSession.expires_at < cutoff).limit(batch_size).all()]
+            if not ids:
+                break
+            AdminSession.query.filter(AdminSession.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            purged += len(ids)
+        
+        return {'expired': expired, 'purged': purged, 'logins': self.flush_logins()}
+    
+    def start_sweeper(self):
+        """Inicia o sweeper em segundo plano, se SESSION_SWEEP_INTERVAL_SECONDS > 0"""
+        interval = float(self.app.config['SESSION_SWEEP_INTERVAL_SECONDS'])
+        if interval <= 0 or self._sweeper is not None:
+            return False
+        
+        self._sweeper = threading.Thread(target=self._run_sweeper, args=(interval,),
+                                         name='session-sweeper', daemon=True)
+        self._sweeper.start()
+        return True
+    
+    def _run_sweeper(self, interval):
+        while not self._stopping.wait(interval):
+            try:
+                with self.app.app_context():
+                    self.sweep_sessions()
+            except Exception as e:
+                print(f"Erro na manutenção das sessões: {e}")
+                print(traceback.format_exc())
+    
+    def _flush_at_exit(self):
+        self._stopping.set()
+        if self.pending_logins and self.app is not None:
+            with self.app.app_context():
+                self.flush_logins()
 
 # Instância global do gerenciador de autenticação
 auth_manager = AuthManager()
@@ -141,6 +468,44 @@ def require_admin(f):
     
     return decorated_function
 
+def measure_password_hash(method, rounds=3):
+    """Tempo médio, em ms, de uma verificação de senha com o método informado"""
+    password_hash = generate_password_hash('calibracao', method=method)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        check_password_hash(password_hash, 'calibracao')
+    return (time.perf_counter() - start) / rounds * 1000
+
+def calibrate_password_hash(method='scrypt', target_ms=250):
+    """
+    Mede o custo do hash neste host e sugere o maior custo dentro de target_ms.
+    
+    No pbkdf2 o tempo cresce linearmente com as iterações; no scrypt, N é uma
+    potência de 2 e também define a memória usada (128 * N * r bytes).
+    Retorna (custo sugerido, lista de (custo, ms) medidos).
+    """
+    name = method.split(':')[0]
+    measurements = []
+    
+    if name == 'pbkdf2':
+        base = 100000
+        elapsed = measure_password_hash(resolve_password_method(method, base))
+        measurements.append((base, elapsed))
+        suggested = max(int(base * target_ms / elapsed) // 10000 * 10000, 10000)
+        measurements.append((suggested, measure_password_hash(resolve_password_method(method, suggested))))
+        return suggested, measurements
+    
+    suggested = None
+    for exponent in range(12, 19):
+        n = 2 ** exponent
+        elapsed = measure_password_hash(resolve_password_method(method, n))
+        measurements.append((n, elapsed))
+        if elapsed > target_ms:
+            break
+        suggested = n
+    
+    return suggested or 2 ** 12, measurements
+
 def create_default_admin():
     """Cria um usuário administrador padrão se não existir"""
     admin = User.query.filter_by(username='admin').first()
@@ -0,0 +1,146 @@
+"""
+Benchmark dos índices compostos: compara o plano de execução e a latência das
+consultas quentes (listagem do portfólio, mensagens de contato e sessões) em um
+banco SQLite temporário com N linhas por tabela, antes e depois de ensure_indexes().
+A listagem do portfólio usa a mesma query da rota (select_rows + keyset_query),
+na primeira página e em uma página profunda (cursor perto do fim).
+
+Uso (a partir de server/):
+    python benchmarks/bench_indexes.py [--rows 100000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func, text
+from models import db, User, PortfolioItem, ContactMessage, AdminSession, ensure_indexes
+from pagination import encode_cursor, keyset_query
+from routes import select_rows
+
+CATEGORIES = ['design', 'video', 'links', 'branding', 'motion']
+TYPES = ['image', 'video', 'link']
+
+def create_bench_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def drop_declared_indexes():
+    """Remove os índices declarados, simulando um banco criado antes deles"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(bind=db.engine, checkfirst=True)
+
+def populate(rows):
+    """Insere N linhas em cada tabela usando inserts em lote"""
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [{
+        'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+        'is_admin': True, 'is_active': True, 'created_at': now
+    } for i in range(100)])
+
+    db.session.execute(PortfolioItem.__table__.insert(), [{
+        'title': f'Item {i}', 'description': 'Descrição de teste', 'tags': '[]',
+        'category': random.choice(CATEGORIES), 'type': random.choice(TYPES),
+        'is_active': random.random() > 0.1, 'created_by': random.randint(1, 100),
+        'created_at': now - timedelta(seconds=i), 'updated_at': now - timedelta(seconds=i)
+    } for i in range(rows)])
+
+    db.session.execute(ContactMessage.__table__.insert(), [{
+        'name': f'Contato {i}', 'email': f'c{i}@example.com', 'subject': 'Assunto',
+        'message': 'Mensagem', 'is_read': random.random() > 0.2,
+        'created_at': now - timedelta(seconds=i)
+    } for i in range(rows)])
+
+    db.session.execute(AdminSession.__table__.insert(), [{
+        'user_id': random.randint(1, 100), 'session_token': str(uuid.uuid4()),
+        'is_active': random.random() > 0.9, 'created_at': now,
+        'expires_at': now + timedelta(hours=24)
+    } for _ in range(rows)])
+
+    db.session.commit()
+
+def portfolio_page(cursor=None, **filters):
+    """A query de GET /api/portfolio para os filtros e o cursor informados"""
+    query = PortfolioItem.query.filter_by(is_active=True, **filters)
+    return keyset_query(select_rows(query), PortfolioItem, 50, cursor)
+
+def deep_cursor(rows):
+    """Cursor de uma página perto do fim da listagem (80% dos itens já percorridos)"""
+    last = PortfolioItem.query.filter_by(is_active=True) \
+        .order_by(PortfolioItem.created_at.desc(), PortfolioItem.id.desc()) \
+        .offset(int(rows * 0.8)).first()
+    return encode_cursor(last.created_at, last.id)
+
+def bench_queries(cursor):
+    """Consultas com o mesmo formato das geradas pelas rotas"""
+    token = db.session.execute(text('SELECT session_token FROM admin_sessions LIMIT 1')).scalar()
+    return {
+        'portfolio (página 1)': portfolio_page(),
+        'portfolio (profunda)': portfolio_page(cursor),
+        'portfolio (categoria)': portfolio_page(category='design'),
+        'portfolio (tipo)': portfolio_page(type='video'),
+        'contato (recentes)': ContactMessage.query.order_by(ContactMessage.created_at.desc()).limit(50),
+        'contato (não lidas)': ContactMessage.query.filter_by(is_read=False)
+            .with_entities(func.count(ContactMessage.id)),
+        'sessão (token)': AdminSession.query.filter_by(session_token=token, is_active=True),
+        'sessão (usuário)': AdminSession.query.filter_by(user_id=42, is_active=True),
+    }
+
+def explain(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+    return '; '.join(row[-1] for row in rows)
+
+def measure(query, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query.all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def run(label, repeat, cursor):
+    print(f'\n=== {label} ===')
+    results = {}
+    for name, query in bench_queries(cursor).items():
+        results[name] = measure(query, repeat)
+        print(f'{name:<24} {results[name]:>9.3f} ms   {explain(query)}')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            drop_declared_indexes()
+
+            print(f'Populando {args.rows} linhas por tabela...')
+            populate(args.rows)
+
+            cursor = deep_cursor(args.rows)
+            before = run('sem índices compostos', args.repeat, cursor)
+            created = ensure_indexes()
+            db.session.execute(text('ANALYZE'))
+            print(f'\nÍndices criados: {", ".join(created)}')
+            after = run('com índices compostos', args.repeat, cursor)
+
+            print('\n=== ganho ===')
+            for name in before:
+                print(f'{name:<24} {before[name] / max(after[name], 1e-9):>8.1f}x')
+
+if __name__ == '__main__':
+    main()
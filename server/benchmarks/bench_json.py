@@ -0,0 +1,121 @@
+"""
+Benchmark da serialização da listagem do portfólio: compara, para uma resposta
+de 1.000 itens, o caminho antigo (objetos ORM + to_dict + json da biblioteca
+padrão) com as tuplas de select_rows() serializadas pelos providers stdlib e
+orjson, e mede a requisição completa GET /api/portfolio com cada provider.
+
+Uso (a partir de server/):
+    python benchmarks/bench_json.py [--items 1000] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.orm import joinedload
+from models import db, User, PortfolioItem
+from cache import response_cache
+from json_provider import JSON_PROVIDERS, orjson
+import routes
+
+CATEGORIES = ['design', 'video', 'links', 'branding', 'motion']
+TYPES = ['image', 'video', 'link']
+
+def create_bench_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['RESPONSE_CACHE_BACKEND'] = 'none'
+    db.init_app(app)
+    response_cache.init_app(app)
+    app.register_blueprint(routes.api_bp, url_prefix='/api')
+    return app
+
+def populate(items):
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [{
+        'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+        'is_admin': True, 'is_active': True, 'created_at': now
+    } for i in range(10)])
+
+    db.session.execute(PortfolioItem.__table__.insert(), [{
+        'title': f'Item {i}', 'description': 'Descrição de teste ' * 5,
+        'tags': json.dumps(random.sample(['logo', 'web', 'motion', '3d', 'branding'], 3)),
+        'variants': json.dumps([{'width': 320, 'height': 240, 'format': 'webp',
+                                 'path': f'uploads/v{i}.webp', 'size': 1234}]),
+        'category': random.choice(CATEGORIES), 'type': random.choice(TYPES),
+        'is_active': True, 'created_by': random.randint(1, 10),
+        'created_at': now - timedelta(seconds=i), 'updated_at': now - timedelta(seconds=i)
+    } for i in range(items)])
+
+    db.session.commit()
+
+def measure(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    # A listagem pública limita a página a MAX_PAGE_SIZE; aqui a resposta tem todos os itens
+    routes.parse_limit = lambda value: args.items
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(os.path.join(tmp, 'bench.db'))
+        client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            print(f'Populando {args.items} itens...')
+            populate(args.items)
+
+            query = PortfolioItem.query.filter_by(is_active=True) \
+                .order_by(PortfolioItem.created_at.desc(), PortfolioItem.id.desc())
+            stdlib = JSON_PROVIDERS['stdlib'](app)
+
+            def orm_stdlib():
+                items = query.options(joinedload(PortfolioItem.creator)).limit(args.items).all()
+                return stdlib.dumps({'items': [item.to_dict() for item in items]})
+
+            def rows_with(provider):
+                def serialize():
+                    rows = routes.select_rows(query).limit(args.items).all()
+                    return provider.dumps({'items': PortfolioItem.rows_to_dicts(rows)})
+                return serialize
+
+            cases = {'orm + to_dict + stdlib (antes)': orm_stdlib,
+                     'tuplas + stdlib': rows_with(stdlib)}
+            if orjson is not None:
+                cases['tuplas + orjson'] = rows_with(JSON_PROVIDERS['orjson'](app))
+
+            print(f'\n=== consulta + serialização ({args.items} itens) ===')
+            baseline = None
+            for name, function in cases.items():
+                elapsed = measure(function, args.repeat)
+                baseline = baseline or elapsed
+                print(f'{name:<32} {elapsed:>9.3f} ms   {baseline / elapsed:>5.1f}x   '
+                      f'{1000 / elapsed:>7.1f} respostas/s')
+
+        print(f'\n=== GET /api/portfolio ({args.items} itens) ===')
+        for name, provider_class in JSON_PROVIDERS.items():
+            if name == 'orjson' and orjson is None:
+                print('orjson não instalado')
+                continue
+            app.json = provider_class(app)
+            elapsed = measure(lambda: client.get('/api/portfolio'), args.repeat)
+            print(f'{name:<32} {elapsed:>9.3f} ms   {1000 / elapsed:>7.1f} respostas/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark do cold start: mede, em interpretadores novos, o tempo de importar
+Flask/SQLAlchemy, o de importar main (que cria a aplicação) e o da primeira
+requisição GET /api/portfolio, com STARTUP_MODE=full (schema e administrador a
+cada início) e STARTUP_MODE=lazy (schema criado antes por 'flask init-db').
+
+Uso (a partir de server/):
+    python benchmarks/bench_startup.py [--runs 10] [--database-url URL]
+
+Sem --database-url é usado um SQLite temporário; com Postgres remoto a
+diferença entre os modos inclui as idas e voltas ao banco na inicialização.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def child():
+    """Executado no subprocesso: importa a aplicação e faz a primeira requisição"""
+    sys.path.insert(0, SERVER_DIR)
+    start = time.perf_counter()
+    import flask, flask_sqlalchemy  # noqa: F401 - custo fixo das bibliotecas, medido à parte
+    libraries = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    response = main.app.test_client().get('/api/portfolio')
+    finished = time.perf_counter()
+    print(json.dumps({
+        'libraries_ms': (libraries - start) * 1000,
+        'create_app_ms': (imported - libraries) * 1000,
+        'first_request_ms': (finished - imported) * 1000,
+        'status': response.status_code
+    }))
+
+def run_child(env):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        env=env, cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, RENDER_DATA_DIR=tmp)
+        if args.database_url:
+            env['DATABASE_URL'] = args.database_url
+
+        # Primeira execução cria o schema, como o 'flask init-db' do deploy
+        run_child(dict(env, STARTUP_MODE='full'))
+
+        print(f'=== cold start ({args.runs} execuções, mediana) ===')
+        print(f"{'modo':<8} {'bibliotecas':>12} {'create_app':>12} {'1ª requisição':>15} {'processo':>10}")
+        for mode in ('full', 'lazy'):
+            results = [run_child(dict(env, STARTUP_MODE=mode)) for _ in range(args.runs)]
+            if any(result['status'] != 200 for result in results):
+                print(f'{mode}: respostas com erro {[result["status"] for result in results]}')
+            median = {key: statistics.median(result[key] for result in results)
+                      for key in ('libraries_ms', 'create_app_ms', 'first_request_ms', 'process_ms')}
+            print(f"{mode:<8} {median['libraries_ms']:>9.1f} ms {median['create_app_ms']:>9.1f} ms "
+                  f"{median['first_request_ms']:>12.1f} ms "
+                  f"{median['process_ms']:>7.1f} ms")
+
+if __name__ == '__main__':
+    main()
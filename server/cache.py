@@ -0,0 +1,229 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Namespace do cache de respostas da listagem pública (versão incrementada a cada escrita)
+PORTFOLIO_CACHE_NAMESPACE = 'portfolio'
+
+class LRUCache:
+    """Cache LRU em memória, limitado em tamanho e com expiração por item (thread-safe)"""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor em cache (ou None), contabilizando acertos e falhas"""
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Armazena um valor, removendo o item menos usado quando o limite é atingido"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove um item do cache"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def delete_where(self, predicate):
+        """Remove todos os itens cujo valor satisfaz o predicado"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def get_counter(self, name):
+        """Retorna o valor de um contador (contadores não sofrem expiração nem despejo)"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def incr_counter(self, name):
+        """Incrementa um contador e retorna o novo valor"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def clear(self):
+        """Esvazia o cache (os contadores são mantidos)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Retorna os contadores de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+class RedisCache:
+    """
+    Cache em um servidor compatível com Redis (redis-py), compartilhado entre processos.
+
+    Os valores são serializados com pickle, portanto o servidor deve ser de uso exclusivo da aplicação.
+    """
+
+    def __init__(self, url, ttl=None, prefix='asteca2:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('O backend redis requer o pacote "redis" (pip install redis)')
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Retorna o valor em cache (ou None), contabilizando acertos e falhas"""
+        raw = self.client.get(self.prefix + key)
+        self._count(raw is not None)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        """Armazena um valor, com expiração opcional em segundos"""
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        """Remove um item do cache"""
+        return bool(self.client.delete(self.prefix + key))
+
+    def get_counter(self, name):
+        """Retorna o valor de um contador compartilhado"""
+        value = self.client.get(self.prefix + 'counter:' + name)
+        return int(value) if value is not None else 0
+
+    def incr_counter(self, name):
+        """Incrementa atomicamente um contador compartilhado e retorna o novo valor"""
+        return self.client.incr(self.prefix + 'counter:' + name)
+
+    def clear(self):
+        """Remove todas as chaves com o prefixo da aplicação"""
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        """Retorna os contadores de uso deste processo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+class ResponseCache:
+    """
+    Cache de respostas já codificadas, versionado por conteúdo.
+
+    Cada escrita no portfólio incrementa a versão global, o que torna todas as
+    entradas anteriores inalcançáveis sem precisar apagá-las. No backend em memória
+    a versão é local ao processo, então o TTL limita quanto tempo outros workers
+    podem servir uma resposta antiga; no backend redis a versão é compartilhada.
+    """
+
+    def __init__(self, app=None):
+        self.backend = 'none'
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 512)
+        app.config.setdefault('RESPONSE_CACHE_TTL_SECONDS', 30)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        backend = self.backend = app.config['RESPONSE_CACHE_BACKEND']
+        ttl = int(app.config['RESPONSE_CACHE_TTL_SECONDS'])
+
+        if backend == 'memory':
+            self.store = LRUCache(max_size=int(app.config['RESPONSE_CACHE_SIZE']), ttl=ttl)
+        elif backend == 'redis':
+            self.store = RedisCache(app.config['RESPONSE_CACHE_REDIS_URL'], ttl=ttl)
+        elif backend == 'none':
+            self.store = None
+        else:
+            raise ValueError(f'RESPONSE_CACHE_BACKEND inválido: {backend}')
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def key(self, namespace, *parts):
+        """Monta a chave da entrada incluindo a versão atual do conteúdo"""
+        if not self.enabled:
+            return None
+
+        version = self.store.get_counter(namespace)
+        raw = '|'.join('' if part is None else str(part) for part in parts)
+        return f"{namespace}:v{version}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        """Retorna a entrada em cache ou None"""
+        if not self.enabled or key is None:
+            return None
+        return self.store.get(key)
+
+    def set(self, key, entry):
+        """Armazena uma entrada"""
+        if self.enabled and key is not None:
+            self.store.set(key, entry)
+
+    def bump_version(self, namespace):
+        """Invalida todas as entradas do namespace (chamado após cada escrita)"""
+        if self.enabled:
+            return self.store.incr_counter(namespace)
+        return None
+
+    def stats(self):
+        """Retorna as métricas do backend em uso"""
+        if not self.enabled:
+            return {'backend': self.backend}
+        return dict(self.store.stats(), backend=self.backend)
+
+# Instância global do cache de respostas
+response_cache = ResponseCache()
@@ -122,17 +122,33 @@ const Admin = () => {
 
   const loadPortfolioItems = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/admin/portfolio?include_inactive=true`, {
-        credentials: 'include',
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('session_token')}`
+      // A listagem é paginada por cursor: segue next_cursor até a última página
+      const items = [];
+      let cursor = null;
+
+      do {
+        const params = new URLSearchParams({ include_inactive: 'true', limit: '200' });
+        if (cursor) {
+          params.set('cursor', cursor);
+        }
+
+        const response = await fetch(`${API_BASE_URL}/admin/portfolio?${params}`, {
+          credentials: 'include',
+          headers: {
+            'Authorization': `Bearer ${localStorage.getItem('session_token')}`
+          }
+        });
+
+        if (!response.ok) {
+          return;
         }
-      });
 
-      if (response.ok) {
         const data = await response.json();
-        setPortfolioItems(data.items);
-      }
+        items.push(...data.items);
+        cursor = data.next_cursor;
+      } while (cursor);
+
+      setPortfolioItems(items);
     } catch (error) {
       console.error('Erro ao carregar itens:', error);
     }
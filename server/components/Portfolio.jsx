@@ -21,14 +21,28 @@ const Portfolio = () => {
       setIsLoading(true);
       setError(null);
       
-      const response = await fetch(`${API_BASE_URL}/portfolio`);
+      // A listagem é paginada por cursor: segue next_cursor até a última página
+      const items = [];
+      let cursor = null;
       
-      if (!response.ok) {
-        throw new Error('Não foi possível carregar os itens do portfólio.');
-      }
+      do {
+        const params = new URLSearchParams({ limit: '200' });
+        if (cursor) {
+          params.set('cursor', cursor);
+        }
+        
+        const response = await fetch(`${API_BASE_URL}/portfolio?${params}`);
+        
+        if (!response.ok) {
+          throw new Error('Não foi possível carregar os itens do portfólio.');
+        }
+        
+        const data = await response.json();
+        items.push(...(data.items || []));
+        cursor = data.next_cursor;
+      } while (cursor);
       
-      const data = await response.json();
-      setPortfolioItems(data.items || []);
+      setPortfolioItems(items);
     } catch (error) {
       console.error("Erro ao buscar portfólio:", error);
       setError(error.message);
@@ -0,0 +1,111 @@
+import gzip
+from flask import current_app, request
+from cache import response_cache
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele apenas gzip é oferecido
+    brotli = None
+
+# Tipos de conteúdo que valem a pena comprimir (imagens e vídeos já são comprimidos)
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    'text/css', 'text/html', 'text/javascript', 'text/plain', 'text/xml'
+}
+
+class ResponseCompressor:
+    """
+    Compressão gzip/brotli das respostas da aplicação (after_request).
+
+    Respostas menores que COMPRESSION_MIN_SIZE, já codificadas ou enviadas
+    direto do disco (send_file) passam intactas; arquivos enviados usam as
+    versões pré-comprimidas geradas por serving.py. O ETag das respostas
+    comprimidas vira fraco, pois os bytes diferem da versão sem compressão.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 5)
+
+        self.enabled = bool(app.config['COMPRESSION_ENABLED'])
+        self.min_size = int(app.config['COMPRESSION_MIN_SIZE'])
+        self.gzip_level = int(app.config['COMPRESSION_GZIP_LEVEL'])
+        self.brotli_quality = int(app.config['COMPRESSION_BROTLI_QUALITY'])
+        app.after_request(self.after_request)
+
+    @property
+    def encodings(self):
+        """Codificações suportadas, na ordem de preferência do servidor"""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def is_compressible(self, mimetype):
+        return mimetype in COMPRESSIBLE_MIMETYPES
+
+    def negotiate(self, size, mimetype):
+        """Escolhe a codificação aceita pelo cliente para um corpo deste tamanho e tipo (ou None)"""
+        if not self.enabled or size < self.min_size or not self.is_compressible(mimetype):
+            return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def cached_response(self, cache_key, entry, mimetype='application/json'):
+        """
+        Monta a resposta de uma entrada do cache de respostas.
+
+        Os bytes comprimidos em cada codificação ficam guardados na própria
+        entrada, então a mesma listagem é comprimida uma vez por versão.
+        """
+        body = entry['body']
+        encoding = self.negotiate(len(body), mimetype)
+
+        if encoding is None:
+            response = current_app.response_class(body, mimetype=mimetype)
+        else:
+            field = f'body_{encoding}'
+            if field not in entry:
+                entry[field] = self.compress(body, encoding)
+                response_cache.set(cache_key, entry)
+            response = current_app.response_class(entry[field], mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+
+        if self.is_compressible(mimetype):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def after_request(self, response):
+        if response.direct_passthrough or not self.is_compressible(response.mimetype):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if 'Content-Encoding' not in response.headers:
+            if response.status_code != 200 or 'Content-Range' in response.headers:
+                return response
+            encoding = self.negotiate(response.calculate_content_length() or 0, response.mimetype)
+            if encoding is None:
+                return response
+            response.set_data(self.compress(response.get_data(), encoding))
+            response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        return response
+
+# Instância global do compressor de respostas
+response_compressor = ResponseCompressor()
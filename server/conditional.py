@@ -0,0 +1,51 @@
+import hashlib
+from datetime import timezone
+from flask import request, make_response
+from sqlalchemy import func
+
+def collection_version(query, model):
+    """
+    Retorna (quantidade, maior updated_at) dos itens da query em uma única consulta agregada.
+
+    Qualquer criação, edição ou remoção (soft delete) altera pelo menos um dos dois valores.
+    """
+    count, last_modified = query.with_entities(
+        func.count(model.id),
+        func.max(model.updated_at)
+    ).order_by(None).one()
+    return count, last_modified
+
+def make_etag(*parts):
+    """Gera um ETag forte a partir das partes que identificam a representação"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+def not_modified_response(etag, last_modified=None):
+    """Retorna uma resposta 304 se o cliente já possui a versão atual, ou None"""
+    if request.if_none_match:
+        # Comparação fraca: respostas comprimidas carregam o mesmo ETag como W/
+        if not request.if_none_match.contains_weak(etag):
+            return None
+    elif request.if_modified_since and last_modified is not None:
+        if _as_utc(last_modified) > request.if_modified_since:
+            return None
+    else:
+        return None
+
+    response = make_response('', 304)
+    return set_cache_validators(response, etag, last_modified)
+
+def set_cache_validators(response, etag, last_modified=None):
+    """Adiciona ETag, Last-Modified e exige revalidação a cada uso do cache"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
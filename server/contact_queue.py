@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import threading
+import traceback
+from datetime import datetime
+from local_sqlite import LocalSQLite
+from models import db, ContactMessage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contact_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL
+);
+"""
+
+class ContactQueueFull(Exception):
+    """A fila local atingiu CONTACT_QUEUE_MAX_PENDING; o cliente deve tentar depois"""
+
+class ContactQueue:
+    """
+    Ingestão assíncrona do formulário de contato.
+
+    No modo CONTACT_INGESTION = 'queue' a rota apenas valida a mensagem e a grava
+    em uma fila local (arquivo SQLite próprio, com fsync), respondendo em seguida.
+    Uma thread por processo descarrega a fila em lotes na tabela contact_messages,
+    a cada CONTACT_FLUSH_INTERVAL segundos ou assim que um lote enche, e uma última
+    vez no encerramento do processo. A entrega é "pelo menos uma vez": mensagens
+    gravadas na fila sobrevivem a quedas e são inseridas no próximo flush.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.store = LocalSQLite(SCHEMA)
+        self.enabled = False
+        self.max_pending = 10000
+        self.batch_size = 500
+        self.flush_interval = 1.0
+        self._thread = None
+        # Funções chamadas com o tamanho de cada lote inserido (ex.: limpar caches)
+        self.flush_callbacks = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CONTACT_INGESTION', 'sync')
+        app.config.setdefault('CONTACT_QUEUE_PATH', os.path.join(app.root_path, 'contact_queue.db'))
+        app.config.setdefault('CONTACT_QUEUE_MAX_PENDING', 10000)
+        app.config.setdefault('CONTACT_FLUSH_BATCH', 500)
+        app.config.setdefault('CONTACT_FLUSH_INTERVAL', 1.0)
+
+        mode = app.config['CONTACT_INGESTION']
+        if mode not in ('sync', 'queue'):
+            raise ValueError(f'CONTACT_INGESTION inválido: {mode}')
+
+        self.app = app
+        self.enabled = mode == 'queue'
+        self.store.configure(app.config['CONTACT_QUEUE_PATH'])
+        self.max_pending = int(app.config['CONTACT_QUEUE_MAX_PENDING'])
+        self.batch_size = int(app.config['CONTACT_FLUSH_BATCH'])
+        self.flush_interval = float(app.config['CONTACT_FLUSH_INTERVAL'])
+
+    def _connect(self):
+        # A mensagem só é confirmada ao cliente depois de estar no disco
+        return self.store.connect(synchronous='FULL')
+
+    def pending(self):
+        """Quantidade de mensagens aguardando o flush"""
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM contact_queue').fetchone()[0]
+
+    def enqueue(self, fields):
+        """
+        Grava a mensagem na fila e retorna o seu id na fila.
+
+        Levanta ContactQueueFull quando há max_pending mensagens pendentes
+        (o flush não está acompanhando ou o banco está indisponível).
+        """
+        fields = dict(fields, created_at=datetime.utcnow().isoformat())
+
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            pending = connection.execute('SELECT COUNT(*) FROM contact_queue').fetchone()[0]
+            if pending >= self.max_pending:
+                connection.execute('ROLLBACK')
+                raise ContactQueueFull('Muitas mensagens pendentes')
+            cursor = connection.execute('INSERT INTO contact_queue (payload) VALUES (?)', (json.dumps(fields),))
+            connection.execute('COMMIT')
+
+        self.start()
+        if pending + 1 >= self.batch_size:
+            self._wakeup.set()
+
+        return cursor.lastrowid
+
+    def flush(self):
+        """
+        Insere as mensagens pendentes em contact_messages, em lotes de batch_size.
+
+        Cada lote é lido e removido da fila na mesma transação (BEGIN IMMEDIATE),
+        então flushers de processos diferentes não inserem a mesma mensagem.
+        Requer app context. Retorna o número de mensagens inseridas.
+        """
+        flushed = 0
+        with self._lock:
+            while True:
+                with self._connect() as connection:
+                    connection.execute('BEGIN IMMEDIATE')
+                    rows = connection.execute(
+                        'SELECT id, payload FROM contact_queue ORDER BY id LIMIT ?', (self.batch_size,)
+                    ).fetchall()
+                    if not rows:
+                        connection.execute('COMMIT')
+                        return flushed
+
+                    messages = [json.loads(payload) for _, payload in rows]
+                    for message in messages:
+                        message['created_at'] = datetime.fromisoformat(message['created_at'])
+                        message['is_read'] = False
+
+                    try:
+                        db.session.execute(ContactMessage.__table__.insert(), messages)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        connection.execute('ROLLBACK')
+                        raise
+
+                    connection.execute('DELETE FROM contact_queue WHERE id <= ?', (rows[-1][0],))
+                    connection.execute('COMMIT')
+
+                flushed += len(rows)
+                for callback in self.flush_callbacks:
+                    callback(len(rows))
+
+    def start(self):
+        """Inicia a thread de flush deste processo (uma vez, na primeira mensagem)"""
+        if self._thread is not None or not self.enabled:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='contact-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"Erro ao descarregar a fila de contato: {e}")
+                print(traceback.format_exc())
+
+    def shutdown(self, timeout=30):
+        """Para a thread e descarrega o que restou na fila (chamado no encerramento)"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        with self.app.app_context():
+            self.flush()
+
+# Instância global da fila de contato
+contact_queue = ContactQueue()
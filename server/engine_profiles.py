@@ -0,0 +1,108 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+# Pragmas aplicadas a cada conexão SQLite no perfil sqlite-local
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),          # leitores não bloqueiam o escritor
+    ('synchronous', 'NORMAL'),        # fsync só nos checkpoints (seguro com WAL)
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -20000),           # ~20 MB de cache de páginas
+    ('temp_store', 'MEMORY'),
+)
+
+# Espera máxima, em segundos, pelo lock de escrita do SQLite (connect_args do sqlite3)
+SQLITE_BUSY_TIMEOUT = 30
+
+ENGINE_PROFILES = ('auto', 'serverless', 'worker', 'sqlite-local')
+
+def resolve_profile(name, database_url):
+    """Resolve o perfil 'auto' pelo banco e pelo ambiente (Vercel/Lambda são serverless)"""
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"DB_ENGINE_PROFILE inválido: {name} (use {', '.join(ENGINE_PROFILES)})")
+    if name == 'sqlite-local' and not database_url.startswith('sqlite'):
+        raise ValueError('DB_ENGINE_PROFILE=sqlite-local requer um DATABASE_URL SQLite')
+
+    if name != 'auto':
+        return name
+    if database_url.startswith('sqlite'):
+        return 'sqlite-local'
+    if os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        return 'serverless'
+    return 'worker'
+
+def engine_options(profile, database_url, pgbouncer=False, pool_size=None, max_overflow=None):
+    """
+    Opções do engine (SQLALCHEMY_ENGINE_OPTIONS) para o perfil.
+
+    serverless: pool mínimo, pre-ping e reciclagem curta, pois a instância pode
+    ficar congelada entre invocações e o servidor fecha conexões ociosas.
+    worker: pool maior e LIFO para processos longos (gunicorn no Render).
+    Com pgbouncer=True o pool fica com o PgBouncer (modo transaction): NullPool
+    e sem prepared statements no servidor.
+    """
+    # As opções dependem do driver da URL: o psycopg2 recusa o 'timeout' do sqlite3.
+    # No SQLite, o timeout é também o busy_timeout (espera pelo lock de escrita)
+    if database_url.startswith('sqlite'):
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT}}
+
+    connect_args = {'connect_timeout': 5}
+
+    if pgbouncer:
+        if database_url.startswith('postgresql+psycopg:'):
+            # psycopg 3 prepara statements repetidos; no modo transaction isso quebra
+            connect_args['prepare_threshold'] = None
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+
+    if profile == 'serverless':
+        options = {'pool_size': 1, 'max_overflow': 2, 'pool_timeout': 10, 'pool_recycle': 300}
+    else:
+        options = {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': 1800,
+                   'pool_use_lifo': True}
+        if database_url.startswith('postgresql'):
+            # Parâmetros da libpq (psycopg2/psycopg); outros drivers os recusam
+            connect_args.update({'keepalives': 1, 'keepalives_idle': 60})
+
+    if pool_size is not None:
+        options['pool_size'] = pool_size
+    if max_overflow is not None:
+        options['max_overflow'] = max_overflow
+
+    options['pool_pre_ping'] = True
+    options['connect_args'] = connect_args
+    return options
+
+def configure_engine(app, engine):
+    """Registra as pragmas do SQLite no engine (chamado com app context, após db.init_app)"""
+    if engine.dialect.name != 'sqlite' or app.config.get('DB_ENGINE_PROFILE') != 'sqlite-local':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(connection, _):
+        cursor = connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def pool_stats(app, engine):
+    """Estado do pool de conexões (e pragmas efetivas no SQLite) para o painel"""
+    pool = engine.pool
+    stats = {
+        'profile': app.config.get('DB_ENGINE_PROFILE'),
+        'pgbouncer': bool(app.config.get('DB_PGBOUNCER')),
+        'dialect': engine.dialect.name,
+        'pool_class': type(pool).__name__,
+        'status': pool.status()
+    }
+
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+
+    if engine.dialect.name == 'sqlite':
+        names = [name for name, _ in SQLITE_PRAGMAS] + ['busy_timeout']
+        with engine.connect() as connection:
+            stats['pragmas'] = {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in names}
+
+    return stats
@@ -0,0 +1,244 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from local_sqlite import LocalSQLite
+
+# Estados possíveis de um job
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    worker_id TEXT,
+    heartbeat_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_id ON jobs (status, id);
+"""
+
+# Colunas acrescentadas depois da primeira versão da fila (arquivos jobs.db existentes)
+ADDED_COLUMNS = (('jobs', 'worker_id', 'TEXT'), ('jobs', 'heartbeat_at', 'TEXT'))
+
+class JobQueue:
+    """
+    Fila de jobs local, persistida em um arquivo SQLite próprio (independente do banco principal).
+
+    Os requests apenas inserem o job; um processo separado (flask jobs-worker)
+    consome a fila. Enquanto executa um job, o worker renova o heartbeat_at dele a
+    cada JOB_HEARTBEAT_SECONDS; jobs em 'running' sem heartbeat há JOB_STALE_SECONDS
+    (worker que caiu) voltam para a fila na verificação periódica de qualquer
+    worker, até max_attempts tentativas.
+    """
+
+    def __init__(self, app=None):
+        self.store = LocalSQLite(SCHEMA, ADDED_COLUMNS)
+        self.max_attempts = 3
+        self.heartbeat_interval = 15
+        self.stale_after = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_QUEUE_PATH', os.path.join(app.root_path, 'jobs.db'))
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_HEARTBEAT_SECONDS', 15)
+        app.config.setdefault('JOB_STALE_SECONDS', 60)
+        self.store.configure(app.config['JOB_QUEUE_PATH'])
+        self.max_attempts = int(app.config['JOB_MAX_ATTEMPTS'])
+        self.heartbeat_interval = float(app.config['JOB_HEARTBEAT_SECONDS'])
+        self.stale_after = float(app.config['JOB_STALE_SECONDS'])
+
+    def _connect(self):
+        return self.store.connect()
+
+    def _to_dict(self, row):
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'payload': json.loads(row['payload']),
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'worker_id': row['worker_id'],
+            'heartbeat_at': row['heartbeat_at']
+        }
+
+    def enqueue(self, kind, payload):
+        """Adiciona um job na fila e retorna o seu id"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO jobs (kind, payload, status, created_at) VALUES (?, ?, ?, ?)',
+                (kind, json.dumps(payload), QUEUED, datetime.utcnow().isoformat())
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        """Retorna um job pelo id (ou None)"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """Retorna os jobs mais recentes, opcionalmente filtrados por estado"""
+        with self._connect() as connection:
+            if status:
+                rows = connection.execute(
+                    'SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?', (status, limit)
+                ).fetchall()
+            else:
+                rows = connection.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        """Retorna a quantidade de jobs em cada estado"""
+        with self._connect() as connection:
+            rows = connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            counts.update({row[0]: row[1] for row in rows})
+            return counts
+
+    def claim(self, worker_id=None):
+        """Reserva o próximo job da fila para este worker (ou retorna None)"""
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+
+            now = datetime.utcnow().isoformat()
+            connection.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, worker_id = ?, '
+                'heartbeat_at = ? WHERE id = ?',
+                (RUNNING, now, worker_id, now, row['id'])
+            )
+            connection.execute('COMMIT')
+
+        return self.get(row['id'])
+
+    def complete(self, job_id, result=None):
+        """Marca o job como concluído, guardando o resultado"""
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ? WHERE id = ?',
+                (DONE, json.dumps(result), datetime.utcnow().isoformat(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """Registra a falha; o job volta para a fila enquanto houver tentativas"""
+        job = self.get(job_id)
+        status = QUEUED if job and job['attempts'] < self.max_attempts else FAILED
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (status, error, datetime.utcnow().isoformat(), job_id)
+            )
+
+    def heartbeat(self, worker_id):
+        """Renova o heartbeat dos jobs em execução por este worker"""
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker_id = ?',
+                (datetime.utcnow().isoformat(), RUNNING, worker_id)
+            )
+
+    def recover(self, stale_after_seconds=None):
+        """Devolve à fila os jobs em 'running' sem heartbeat recente (worker interrompido)"""
+        if stale_after_seconds is None:
+            stale_after_seconds = self.stale_after
+        cutoff = (datetime.utcnow() - timedelta(seconds=stale_after_seconds)).isoformat()
+        # Jobs reservados antes do heartbeat existir só têm started_at
+        stale = 'status = ? AND COALESCE(heartbeat_at, started_at) < ?'
+        with self._connect() as connection:
+            connection.execute(
+                f'UPDATE jobs SET status = ?, error = ? WHERE {stale} AND attempts >= ?',
+                (FAILED, 'Worker interrompido', RUNNING, cutoff, self.max_attempts)
+            )
+            cursor = connection.execute(
+                f'UPDATE jobs SET status = ?, worker_id = NULL WHERE {stale}',
+                (QUEUED, RUNNING, cutoff)
+            )
+            return cursor.rowcount
+
+    def _heartbeat_loop(self, worker_id, stopping):
+        while not stopping.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat(worker_id)
+            except Exception as e:
+                print(f"Erro ao renovar o heartbeat dos jobs: {e}")
+
+    def run_worker(self, handlers, poll_interval=2.0, once=False):
+        """
+        Consome a fila executando o handler registrado para cada tipo de job.
+
+        Uma thread renova o heartbeat do job em execução, e a cada
+        JOB_HEARTBEAT_SECONDS o loop devolve à fila os jobs de workers que caíram
+        (inclusive um anterior deste mesmo processo, reiniciado pelo supervisor).
+        Com once=True, processa o que estiver na fila e retorna. Retorna o número
+        de jobs processados.
+        """
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        stopping = threading.Event()
+        threading.Thread(target=self._heartbeat_loop, args=(worker_id, stopping),
+                         name='jobs-heartbeat', daemon=True).start()
+
+        try:
+            return self._consume(handlers, worker_id, poll_interval, once)
+        finally:
+            stopping.set()
+
+    def _consume(self, handlers, worker_id, poll_interval, once):
+        processed = 0
+        next_recover = 0
+
+        while True:
+            if time.monotonic() >= next_recover:
+                recovered = self.recover()
+                if recovered:
+                    print(f"Jobs devolvidos à fila (worker interrompido): {recovered}")
+                next_recover = time.monotonic() + self.heartbeat_interval
+
+            job = self.claim(worker_id)
+
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            handler = handlers.get(job['kind'])
+            try:
+                if handler is None:
+                    raise ValueError(f"Nenhum handler para jobs do tipo {job['kind']}")
+                self.complete(job['id'], handler(job['payload']))
+            except Exception as e:
+                print(f"Erro no job {job['id']} ({job['kind']}): {e}")
+                print(traceback.format_exc())
+                self.fail(job['id'], str(e))
+
+            processed += 1
+
+# Instância global da fila de jobs
+job_queue = JobQueue()
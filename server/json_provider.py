@@ -0,0 +1,61 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele fica o encoder da biblioteca padrão
+    orjson = None
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Provider da biblioteca padrão com datas em ISO 8601.
+
+    O provider padrão do Flask converte datetime para o formato HTTP (RFC 822);
+    aqui a saída é a mesma do orjson, para que as respostas não dependam do
+    provider instalado.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    Provider baseado no orjson: serializa direto para bytes e trata datetime,
+    date e UUID nativamente (sem isoformat() por linha nas listagens).
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def _dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps(obj), mimetype=self.mimetype)
+
+JSON_PROVIDERS = {
+    'stdlib': StdlibJSONProvider,
+    'orjson': OrjsonProvider
+}
+
+def json_provider_class(name='auto'):
+    """Escolhe o provider pelo nome ('auto' usa o orjson quando estiver instalado)"""
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER inválido: {name} (use auto, {', '.join(JSON_PROVIDERS)})")
+    if name == 'orjson' and orjson is None:
+        raise ValueError('JSON_PROVIDER=orjson requer o pacote orjson instalado')
+
+    return JSON_PROVIDERS[name]
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+
+class LocalSQLite:
+    """
+    Arquivo SQLite próprio de um componente (fila de jobs, fila de contato),
+    independente do banco principal.
+
+    O schema é criado, em modo WAL, na primeira conexão após configure(); as
+    colunas de added_columns ((tabela, coluna, tipo)) são acrescentadas a
+    arquivos criados por versões anteriores.
+    """
+
+    def __init__(self, schema, added_columns=()):
+        self.schema = schema
+        self.added_columns = added_columns
+        self.path = None
+        self._initialized = False
+
+    def configure(self, path):
+        self.path = path
+        self._initialized = False
+
+    @contextmanager
+    def connect(self, synchronous=None):
+        """Abre uma conexão em autocommit (linhas sqlite3.Row), fechada ao sair do bloco"""
+        import sqlite3  # sob demanda: o arquivo só é aberto no primeiro uso
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            if not self._initialized:
+                self._initialize(connection)
+            if synchronous:
+                connection.execute(f'PRAGMA synchronous={synchronous}')
+            yield connection
+        finally:
+            connection.close()
+
+    def _initialize(self, connection):
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(self.schema)
+        for table, name, column_type in self.added_columns:
+            columns = {row['name'] for row in connection.execute(f'PRAGMA table_info({table})')}
+            if name not in columns:
+                connection.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+        self._initialized = True
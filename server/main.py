@@ -1,8 +1,35 @@
+import hmac
 import os
+import click
 import traceback # <-- 1. ADICIONE ESTA LINHA
-from flask import Flask, send_from_directory
+from flask import Flask, Response, abort, request
 from flask_cors import CORS
-from auth import auth_manager, create_default_admin
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, ensure_columns, ensure_indexes, ensure_item_tags, password_hash_method
+from cache import response_cache
+from auth import auth_manager, create_default_admin, calibrate_password_hash
+from routes import api_bp, admin_stats_cache
+from media import image_processor, process_video_job, VIDEO_METADATA_JOB
+from jobs import job_queue
+from uploads import MAX_VIDEO_SIZE, CHUNK_SIZE, collect_garbage, collect_partial_uploads
+from serving import serve_upload
+from json_provider import json_provider_class
+from compression import response_compressor
+from contact_queue import contact_queue
+from ratelimit import rate_limiter
+from engine_profiles import resolve_profile, engine_options, configure_engine
+from metrics import request_metrics
+
+def init_database():
+    """Cria as tabelas, colunas e índices que faltam e o administrador padrão (requer app context)"""
+    from search import ensure_search_index
+    db.create_all()
+    ensure_columns()
+    ensure_indexes()
+    ensure_search_index()
+    ensure_item_tags()
+    # Cria usuário administrador padrão
+    create_default_admin()
 
 def create_app():
     """Factory function para criar a aplicação Flask"""
@@ -16,6 +43,56 @@ def create_app():
         # Configurações da aplicação
         app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
         app.config['SESSION_DURATION_HOURS'] = int(os.environ.get('SESSION_DURATION_HOURS', '24'))
+        app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'database')
+        app.config['SESSION_SWEEP_INTERVAL_SECONDS'] = int(os.environ.get('SESSION_SWEEP_INTERVAL_SECONDS', '0'))
+        app.config['SESSION_RETENTION_DAYS'] = int(os.environ.get('SESSION_RETENTION_DAYS', '7'))
+        
+        # Custo do hash de senhas (ver 'flask calibrate-password-hash'); hashes antigos são
+        # regravados no login seguinte
+        app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+        if os.environ.get('PASSWORD_HASH_ITERATIONS'):
+            app.config['PASSWORD_HASH_ITERATIONS'] = int(os.environ['PASSWORD_HASH_ITERATIONS'])
+        
+        # Cache de respostas da listagem pública: 'memory', 'redis' ou 'none'
+        app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config['RESPONSE_CACHE_TTL_SECONDS'] = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '30'))
+        if os.environ.get('REDIS_URL'):
+            app.config['RESPONSE_CACHE_REDIS_URL'] = os.environ['REDIS_URL']
+            app.config['RATELIMIT_REDIS_URL'] = os.environ['REDIS_URL']
+        
+        # Limite de requisições (login e contato): contadores 'memory' (por processo) ou 'redis'
+        app.config['RATELIMIT_BACKEND'] = os.environ.get('RATELIMIT_BACKEND', 'memory')
+        app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+        # Quantidade de proxies confiáveis na frente da aplicação (Render, Vercel, nginx): o IP do
+        # cliente é a entrada do X-Forwarded-For adicionada pelo mais externo deles, nunca a mais à
+        # esquerda, que o próprio cliente controla. No Render e na Vercel (um proxy) o padrão é 1;
+        # RATELIMIT_TRUST_PROXY=true (nome antigo) também equivale a 1
+        behind_proxy = bool(os.environ.get('RENDER') or os.environ.get('VERCEL')) or \
+            os.environ.get('RATELIMIT_TRUST_PROXY', 'false').lower() == 'true'
+        app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', '1' if behind_proxy else '0'))
+        if app.config['PROXY_HOPS'] > 0:
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_HOPS'])
+        elif app.config['RATELIMIT_ENABLED']:
+            # Atrás de um proxy sem PROXY_HOPS todos os visitantes dividem o IP do proxy:
+            # 5 contatos ou 10 logins errados por minuto bloqueiam o site inteiro
+            print("!!!!!!!! AVISO: limite de requisições ativo com PROXY_HOPS=0; se houver um proxy "
+                  "na frente da aplicação, defina PROXY_HOPS (todos os clientes terão o IP dele) !!!!!!!!")
+        app.config['ADMIN_STATS_CACHE_TTL_SECONDS'] = int(os.environ.get('ADMIN_STATS_CACHE_TTL_SECONDS', '10'))
+        app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', '2'))
+        
+        # Diretório de dados locais (SQLite de desenvolvimento e fila de jobs)
+        data_dir = os.environ.get('RENDER_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+        
+        # Garante que o diretório existe
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        
+        app.config['JOB_QUEUE_PATH'] = os.path.join(data_dir, 'jobs.db')
+        
+        # Formulário de contato: 'sync' (grava na hora) ou 'queue' (fila local + inserts em lote)
+        app.config['CONTACT_INGESTION'] = os.environ.get('CONTACT_INGESTION', 'sync')
+        app.config['CONTACT_QUEUE_PATH'] = os.path.join(data_dir, 'contact_queue.db')
+        app.config['CONTACT_QUEUE_MAX_PENDING'] = int(os.environ.get('CONTACT_QUEUE_MAX_PENDING', '10000'))
         
         # Configuração do banco de dados
         database_url = os.environ.get('DATABASE_URL')
@@ -27,33 +104,188 @@ def create_app():
             app.config['SQLALCHEMY_DATABASE_URI'] = database_url
         else:
             # SQLite para desenvolvimento local
-            data_dir = os.environ.get('RENDER_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
             db_path = os.path.join(data_dir, 'app.db')
             app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-            
-            # Garante que o diretório existe
-            if not os.path.exists(data_dir):
-                os.makedirs(data_dir)
         
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
         
+        # Perfil do engine: 'auto', 'serverless' (Vercel), 'worker' (gunicorn) ou 'sqlite-local';
+        # DB_PGBOUNCER=true deixa o pool para o PgBouncer (modo transaction)
+        app.config['DB_ENGINE_PROFILE'] = resolve_profile(
+            os.environ.get('DB_ENGINE_PROFILE', 'auto'), app.config['SQLALCHEMY_DATABASE_URI']
+        )
+        app.config['DB_PGBOUNCER'] = os.environ.get('DB_PGBOUNCER', 'false').lower() == 'true'
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+            app.config['DB_ENGINE_PROFILE'],
+            app.config['SQLALCHEMY_DATABASE_URI'],
+            pgbouncer=app.config['DB_PGBOUNCER'],
+            pool_size=int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None,
+            max_overflow=int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+        )
+        
+        # Inicialização: 'full' cria o schema e o administrador a cada início; 'lazy' (opcional)
+        # deixa isso para 'flask init-db', que deve rodar no build/deploy antes de cada versão
+        # que altera o schema, encurtando o cold start no serverless
+        startup_mode = os.environ.get('STARTUP_MODE', 'full')
+        if startup_mode not in ('full', 'lazy'):
+            raise ValueError(f'STARTUP_MODE inválido: {startup_mode}')
+        app.config['STARTUP_MODE'] = startup_mode
+        
+        # Entrega de mídia: 'none' (Flask envia os bytes), 'x-sendfile' ou 'x-accel' (proxy envia)
+        app.config['MEDIA_OFFLOAD'] = os.environ.get('MEDIA_OFFLOAD', 'none')
+        app.config['USE_X_SENDFILE'] = app.config['MEDIA_OFFLOAD'] == 'x-sendfile'
+        if os.environ.get('MEDIA_ACCEL_PREFIX'):
+            app.config['MEDIA_ACCEL_PREFIX'] = os.environ['MEDIA_ACCEL_PREFIX']
+        
+        # Compressão gzip/brotli das respostas acima deste tamanho (em bytes)
+        app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+        
+        # Serialização JSON: 'auto' (orjson se instalado), 'orjson' ou 'stdlib'
+        app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'auto')
+        app.json = json_provider_class(app.config['JSON_PROVIDER'])(app)
+        
+        # Limite do corpo das requisições: o maior limite por tipo (vídeo) mais a folga do multipart
+        app.config['MAX_CONTENT_LENGTH'] = MAX_VIDEO_SIZE + CHUNK_SIZE
+        
+        # Origem do front-end React (ex.: https://www.exemplo.com.br), a única que lê o
+        # Server-Timing do painel em requisições cross-origin
+        app.config['FRONTEND_ORIGIN'] = os.environ.get('FRONTEND_ORIGIN')
+        app.config['SERVER_TIMING_PUBLIC'] = os.environ.get('SERVER_TIMING_PUBLIC', 'false').lower() == 'true'
+        
+        # Métricas por requisição (/metrics e Server-Timing); METRICS_TOKEN protege o /metrics,
+        # que sem token só é publicado com METRICS_ENABLED=true explícito
+        app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+        app.config['METRICS_ENABLED'] = os.environ.get(
+            'METRICS_ENABLED', 'true' if app.config['METRICS_TOKEN'] else 'false'
+        ).lower() == 'true'
+        
+        # Consultas acima de SLOW_QUERY_MS vão para o log (0 desliga); parâmetros só com SLOW_QUERY_LOG_PARAMS
+        app.config['SLOW_QUERY_MS'] = int(os.environ.get('SLOW_QUERY_MS', '250'))
+        app.config['SLOW_QUERY_LOG_PARAMS'] = os.environ.get('SLOW_QUERY_LOG_PARAMS', 'false').lower() == 'true'
+        
+        # Profiler da API (PROFILER_ENABLED): requisições com "X-Profile: <PROFILER_TOKEN>" ou armadas pelo painel
+        app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+        app.config['PROFILER_TOKEN'] = os.environ.get('PROFILER_TOKEN')
+        app.config['PROFILER_OUTPUT_DIR'] = os.path.join(data_dir, 'profiles')
+        
         # Inicializa extensões
         db.init_app(app)
+        request_metrics.init_app(app)
+        if app.config['SLOW_QUERY_MS'] > 0:
+            from profiling import slow_query_log
+            slow_query_log.init_app(app)
+        if app.config['PROFILER_ENABLED']:
+            from profiling import request_profiler
+            request_profiler.init_app(app)
         auth_manager.init_app(app)
+        response_cache.init_app(app)
+        image_processor.init_app(app)
+        job_queue.init_app(app)
+        response_compressor.init_app(app)
+        contact_queue.init_app(app)
+        rate_limiter.init_app(app)
         
         # Registra blueprints
         app.register_blueprint(api_bp, url_prefix='/api')
         
-        # Rota para servir arquivos estáticos (uploads)
-        @app.route('/uploads/<filename>')
+        # Caches cujos acertos e falhas aparecem no /metrics
+        request_metrics.register_cache('responses', response_cache.stats)
+        request_metrics.register_cache('admin_stats', admin_stats_cache.stats)
+        request_metrics.register_cache(
+            'sessions', lambda: auth_manager.backend.cache.stats() if getattr(auth_manager.backend, 'cache', None) else {}
+        )
+        
+        # Rota para servir arquivos estáticos (uploads), com Range, ETag e cache imutável
+        @app.route('/uploads/<path:filename>')
         def uploaded_file(filename):
-            return send_from_directory('uploads', filename)
+            return serve_upload(filename)
+        
+        # Criação do schema e do administrador padrão (obrigatório antes do primeiro deploy em modo lazy)
+        @app.cli.command('init-db')
+        def init_db_command():
+            """Cria as tabelas, colunas, índices e o administrador padrão"""
+            init_database()
+            print("Banco de dados inicializado com sucesso!")
+        
+        # Comando para aplicar colunas e índices em bancos criados antes deles existirem
+        @app.cli.command('create-indexes')
+        def create_indexes_command():
+            """Cria as colunas e os índices declarados nos modelos que faltam no banco"""
+            from search import ensure_search_index
+            columns = ensure_columns()
+            print(f"Colunas criadas: {', '.join(columns) if columns else 'nenhuma'}")
+            created = ensure_indexes()
+            print(f"Índices criados: {', '.join(created) if created else 'nenhum'}")
+            print(f"Itens com tags normalizadas: {ensure_item_tags()}")
+            print(f"Índice de busca textual: {'ok' if ensure_search_index() else 'não suportado neste banco'}")
+        
+        # Comando para remover arquivos enviados que nenhum item usa
+        @app.cli.command('gc-uploads')
+        @click.option('--grace-hours', default=24, help='Idade mínima, em horas, dos arquivos sem referência')
+        @click.option('--partial-hours', default=24, help='Inatividade, em horas, após a qual uploads retomáveis são descartados')
+        def gc_uploads_command(grace_hours, partial_hours):
+            """Remove arquivos sem referências em itens do portfólio e uploads retomáveis abandonados"""
+            removed = collect_garbage(grace_hours)
+            print(f"Arquivos removidos: {len(removed)}")
+            abandoned = collect_partial_uploads(partial_hours)
+            print(f"Uploads retomáveis descartados: {len(abandoned)}")
+        
+        # Worker da fila de jobs (poster e metadados de vídeos), executado como processo separado
+        @app.cli.command('jobs-worker')
+        @click.option('--once', is_flag=True, help='Processa os jobs pendentes e encerra')
+        @click.option('--poll-interval', default=2.0, help='Intervalo, em segundos, entre consultas à fila')
+        def jobs_worker_command(once, poll_interval):
+            """Consome a fila de jobs em segundo plano"""
+            processed = job_queue.run_worker(
+                {VIDEO_METADATA_JOB: process_video_job},
+                poll_interval=poll_interval,
+                once=once
+            )
+            print(f"Jobs processados: {processed}")
+        
+        # Mede o custo do hash de senhas neste host e sugere a configuração
+        @app.cli.command('calibrate-password-hash')
+        @click.option('--method', default='scrypt', help='scrypt ou pbkdf2[:digest]')
+        @click.option('--target-ms', default=250, help='Tempo máximo desejado por verificação de senha')
+        def calibrate_password_hash_command(method, target_ms):
+            """Sugere PASSWORD_HASH_ITERATIONS para o tempo de login desejado"""
+            suggested, measurements = calibrate_password_hash(method, target_ms)
+            for cost, elapsed in measurements:
+                print(f"{method} custo={cost}: {elapsed:.1f} ms")
+            print(f"Configuração atual: {password_hash_method()}")
+            print(f"Sugestão: PASSWORD_HASH_METHOD={method} PASSWORD_HASH_ITERATIONS={suggested}")
+            print("Os hashes existentes são regravados no próximo login de cada usuário.")
+        
+        # Manutenção das sessões (agendável via cron quando o sweeper em segundo plano está desligado)
+        @app.cli.command('sweep-sessions')
+        @click.option('--retention-days', default=None, type=int, help='Dias que sessões expiradas ficam na tabela')
+        def sweep_sessions_command(retention_days):
+            """Desativa sessões expiradas, apaga as antigas e grava os últimos logins pendentes"""
+            result = auth_manager.sweep_sessions(retention_days)
+            print(f"Sessões expiradas: {result['expired']}, removidas: {result['purged']}, "
+                  f"logins gravados: {result['logins']}")
+        
+        # Descarrega manualmente a fila do formulário de contato
+        @app.cli.command('flush-contacts')
+        def flush_contacts_command():
+            """Insere em contact_messages as mensagens pendentes na fila local"""
+            print(f"Mensagens inseridas: {contact_queue.flush()}")
         
         # Rota de teste
         @app.route('/')
         def index():
             return "API do Portfólio ASTECA2 - VORTEX está funcionando!"
         
+        # Métricas no formato do Prometheus (contadores deste processo)
+        @app.route('/metrics')
+        def metrics():
+            if not app.config['METRICS_ENABLED']:
+                abort(404)
+            token = app.config['METRICS_TOKEN']
+            if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+                return {'error': 'Token de métricas inválido'}, 401
+            return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+        
         # Rota de health check
         @app.route('/health')
         def health_check():
@@ -61,10 +293,16 @@ def create_app():
         
         # Inicialização do banco de dados
         with app.app_context():
-            db.create_all()
-            # Cria usuário administrador padrão
-            create_default_admin()
-            print("Banco de dados inicializado com sucesso!")
+            configure_engine(app, db.engine)
+            if app.config['STARTUP_MODE'] == 'full':
+                init_database()
+                print("Banco de dados inicializado com sucesso!")
+        
+        # Inicia o flusher, que também insere o que ficou na fila antes de um reinício
+        # (no modo lazy ele é iniciado pela primeira mensagem enfileirada)
+        if app.config['STARTUP_MODE'] == 'full':
+            contact_queue.start()
+        auth_manager.start_sweeper()
 
     # 3. ADICIONE O BLOCO 'except' NO FINAL DA FUNÇÃO
     except Exception as e:
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import traceback
+from models import db, PortfolioItem, StoredFile
+from cache import response_cache, PORTFOLIO_CACHE_NAMESPACE
+from uploads import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+# Larguras das versões responsivas e tamanho da thumbnail da grade
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+THUMBNAIL_SIZE = (400, 300)
+
+# Tipo dos jobs de extração de metadados de vídeo na fila local
+VIDEO_METADATA_JOB = 'video_metadata'
+
+def is_image(path):
+    return path.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+
+def is_video(path):
+    return path.rsplit('.', 1)[-1].lower() in VIDEO_EXTENSIONS
+
+def variant_path(original_path, suffix, extension):
+    """Caminho de uma versão derivada, ao lado do original endereçado por conteúdo"""
+    base = original_path.rsplit('.', 1)[0]
+    return f'{base}_{suffix}.{extension}'
+
+def generate_image_variants(original_path):
+    """
+    Gera a thumbnail e as versões por largura (WebP e JPEG) de uma imagem.
+
+    Retorna (caminho da thumbnail, lista de versões). Larguras maiores que a do
+    original não são geradas (nunca amplia a imagem).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(original_path) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        image = background
+
+    thumbnail_path = variant_path(original_path, 'thumb', 'jpg')
+    ImageOps.fit(image, THUMBNAIL_SIZE, Image.LANCZOS).save(thumbnail_path, 'JPEG', quality=82, optimize=True)
+
+    variants = []
+    for width in VARIANT_WIDTHS:
+        if width >= image.width and variants:
+            break
+        target_width = min(width, image.width)
+        height = round(image.height * target_width / image.width)
+        resized = image.resize((target_width, height), Image.LANCZOS)
+
+        for extension, pil_format in VARIANT_FORMATS:
+            path = variant_path(original_path, f'w{target_width}', extension)
+            resized.save(path, pil_format, quality=80, optimize=True)
+            variants.append({
+                'width': target_width,
+                'height': height,
+                'format': extension,
+                'path': path,
+                'size': os.path.getsize(path)
+            })
+
+    return thumbnail_path, variants
+
+def probe_video(path):
+    """Lê duração e dimensões do primeiro stream de vídeo usando o ffprobe"""
+    import subprocess
+
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path],
+        capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+    data = json.loads(output)
+    stream = (data.get('streams') or [{}])[0]
+    duration = data.get('format', {}).get('duration')
+
+    return {
+        'duration': round(float(duration), 3) if duration else None,
+        'width': stream.get('width'),
+        'height': stream.get('height')
+    }
+
+def extract_poster_frame(path, duration=None):
+    """Extrai um quadro do vídeo (1s ou metade de vídeos curtos) como JPEG"""
+    import subprocess
+
+    poster_path = variant_path(path, 'poster', 'jpg')
+    position = min(1.0, duration / 2) if duration else 0
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-ss', str(position), '-i', path,
+         '-frames:v', '1', '-vf', f'scale={THUMBNAIL_SIZE[0] * 2}:-2', '-q:v', '3', poster_path],
+        capture_output=True, check=True, timeout=120
+    )
+    return poster_path
+
+def process_video_job(payload):
+    """
+    Handler dos jobs de vídeo: extrai metadados e o poster e grava no StoredFile
+    e nos itens que usam o arquivo. Executado pelo worker, com app context ativo.
+    """
+    file_path = payload['file_path']
+    stored = StoredFile.query.filter_by(path=file_path).first()
+    if stored is None:
+        raise ValueError(f'Arquivo não registrado: {file_path}')
+
+    media_info = probe_video(file_path)
+    poster_path = extract_poster_frame(file_path, media_info['duration'])
+    encoded = json.dumps(media_info)
+
+    stored.media_info = encoded
+    stored.thumbnail_path = poster_path
+
+    items = PortfolioItem.query.filter_by(file_path=file_path).all()
+    for item in items:
+        item.media_info = encoded
+        if not item.thumbnail_path:
+            item.thumbnail_path = poster_path
+
+    db.session.commit()
+
+    if items:
+        response_cache.bump_version(PORTFOLIO_CACHE_NAMESPACE)
+
+    return dict(media_info, poster_path=poster_path, items_updated=len(items))
+
+def attach_variants(item):
+    """Copia para o item as versões, poster e metadados já gerados para o seu arquivo (se houver)"""
+    if not item.file_path:
+        return
+
+    stored = StoredFile.query.filter_by(path=item.file_path).first()
+    if stored is None:
+        return
+
+    if stored.variants:
+        item.variants = stored.variants
+    if stored.media_info:
+        item.media_info = stored.media_info
+    if stored.thumbnail_path and not item.thumbnail_path:
+        item.thumbnail_path = stored.thumbnail_path
+
+class ImageProcessor:
+    """
+    Pool de threads que gera thumbnails e versões responsivas das imagens enviadas.
+
+    O upload apenas agenda o trabalho; ao terminar, o resultado é gravado no
+    StoredFile e nos itens que já usam o arquivo, e a listagem em cache é invalidada.
+    Itens criados depois recebem as versões via attach_variants.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 2
+        self.executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_WORKERS', 2)
+        self.app = app
+        self.workers = int(app.config['IMAGE_WORKERS'])
+        self.executor = None
+
+    def submit(self, file_path):
+        """Agenda a geração das versões de uma imagem; retorna False se não se aplica"""
+        if self.app is None or not is_image(file_path):
+            return False
+
+        with self._lock:
+            if file_path in self._pending:
+                return True
+            self._pending.add(file_path)
+            # O pool só é criado no primeiro upload de imagem (fora do cold start)
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-variants')
+
+        self.executor.submit(self._process, file_path)
+        return True
+
+    def _process(self, file_path):
+        try:
+            with self.app.app_context():
+                stored = StoredFile.query.filter_by(path=file_path).first()
+                if stored is None or stored.variants:
+                    return
+
+                thumbnail_path, variants = generate_image_variants(file_path)
+                encoded = json.dumps(variants)
+
+                stored.thumbnail_path = thumbnail_path
+                stored.variants = encoded
+
+                items = PortfolioItem.query.filter_by(file_path=file_path).all()
+                for item in items:
+                    item.variants = encoded
+                    if not item.thumbnail_path:
+                        item.thumbnail_path = thumbnail_path
+
+                db.session.commit()
+
+                if items:
+                    response_cache.bump_version(PORTFOLIO_CACHE_NAMESPACE)
+        except Exception as e:
+            print(f"Erro ao gerar versões de {file_path}: {e}")
+            print(traceback.format_exc())
+        finally:
+            with self._lock:
+                self._pending.discard(file_path)
+
+    def shutdown(self, wait=True):
+        """Aguarda (ou não) os trabalhos em andamento e encerra o pool"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+
+# Instância global do processador de imagens
+image_processor = ImageProcessor()
@@ -0,0 +1,216 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, has_request_context, request
+from query_timing import query_timer
+
+# Limites dos histogramas (segundos para latência, bytes para tamanho, contagem para consultas)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus, uma série por combinação de rótulos"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: dict(data, counts=list(data['counts'])) for labels, data in self._series.items()}
+
+        for labels, data in sorted(series.items()):
+            labels = list(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['counts']):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + [('le', format_value(float(bound)))], cumulative
+            yield f'{self.name}_bucket', labels + [('le', '+Inf')], data['count']
+            yield f'{self.name}_sum', labels, data['sum']
+            yield f'{self.name}_count', labels, data['count']
+
+class Counter:
+    """Contador monotônico por combinação de rótulos"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description, label_names):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, list(zip(self.label_names, labels)), value
+
+class RequestMetrics:
+    """
+    Instrumentação das requisições da aplicação.
+
+    Para cada requisição registra a latência, o tamanho da resposta e a
+    quantidade e o tempo das consultas SQL (eventos do engine), agrupados pelo
+    endpoint do Flask. Os valores saem no formato texto do Prometheus em
+    /metrics e, por requisição, no cabeçalho Server-Timing (app, db), que o
+    painel lê pela Resource Timing API. O cabeçalho vai só nas respostas a
+    administradores autenticados, a menos que SERVER_TIMING_PUBLIC esteja
+    ligado. Os contadores são por processo: com vários workers o Prometheus
+    soma as séries de cada um.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.server_timing = True
+        self.server_timing_public = False
+        # Funções que retornam os contadores (hits/misses) de cada cache, lidas no /metrics
+        self.caches = {}
+        self.requests = Counter('http_requests_total', 'Requisições atendidas', ('endpoint', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'Latência das requisições',
+                                 ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.response_size = Histogram('http_response_size_bytes', 'Tamanho do corpo das respostas',
+                                       ('endpoint',), SIZE_BUCKETS)
+        self.query_count = Histogram('db_queries_per_request', 'Consultas SQL por requisição',
+                                     ('endpoint',), QUERY_BUCKETS)
+        self.query_time = Histogram('db_query_duration_seconds', 'Tempo em consultas SQL por requisição',
+                                    ('endpoint',), LATENCY_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Registra os hooks; chamar depois de db.init_app e antes das extensões com after_request"""
+        # Se definido, /metrics exige "Authorization: Bearer <token>"; sem ele, o /metrics
+        # (latência por rota, estado do pool) fica desligado a menos que seja pedido
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_ENABLED', bool(app.config['METRICS_TOKEN']))
+        # Server-Timing nas respostas do painel administrativo; SERVER_TIMING_PUBLIC o
+        # estende a todas as respostas (expõe o tempo de banco de cada rota a anônimos)
+        app.config.setdefault('SERVER_TIMING_ENABLED', True)
+        app.config.setdefault('SERVER_TIMING_PUBLIC', False)
+        # Origem que pode ler o Server-Timing em requisições cross-origin (o painel React);
+        # sem ela, só a própria origem da API
+        app.config.setdefault('SERVER_TIMING_ALLOW_ORIGIN', app.config.get('FRONTEND_ORIGIN'))
+
+        self.enabled = bool(app.config['METRICS_ENABLED'])
+        self.server_timing = bool(app.config['SERVER_TIMING_ENABLED'])
+        self.server_timing_public = bool(app.config['SERVER_TIMING_PUBLIC'])
+        if not self.enabled and not self.server_timing:
+            return
+
+        query_timer.observe(app, self._record_query)
+
+        app.before_request(self.before_request)
+        # Os hooks after_request rodam na ordem inversa do registro: este, registrado
+        # primeiro, roda por último e mede a resposta já comprimida
+        app.after_request(self.after_request)
+
+    def register_cache(self, name, stats):
+        self.caches[name] = stats
+
+    def _record_query(self, statement, parameters, elapsed):
+        if has_request_context():
+            g.sql_time = g.get('sql_time', 0.0) + elapsed
+            g.sql_count = g.get('sql_count', 0) + 1
+
+    def before_request(self):
+        g.request_started = time.perf_counter()
+
+    def after_request(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+
+        elapsed = time.perf_counter() - started
+        sql_count = g.get('sql_count', 0)
+        sql_time = g.get('sql_time', 0.0)
+
+        if self.enabled:
+            endpoint = request.endpoint or 'unmatched'
+            if endpoint != 'metrics':
+                self.requests.inc(endpoint, request.method, response.status_code)
+                self.latency.observe(elapsed, endpoint, request.method)
+                self.query_count.observe(sql_count, endpoint)
+                self.query_time.observe(sql_time, endpoint)
+                size = response.calculate_content_length()
+                if size is not None:
+                    self.response_size.observe(size, endpoint)
+
+        if self.server_timing and (self.server_timing_public or self._is_admin_request()):
+            response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+            response.headers.add('Server-Timing', f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries"')
+            allow_origin = current_app.config['SERVER_TIMING_ALLOW_ORIGIN']
+            if allow_origin:
+                response.headers['Timing-Allow-Origin'] = allow_origin
+
+        return response
+
+    def _is_admin_request(self):
+        # require_admin guarda o usuário autenticado na requisição
+        user = getattr(request, 'current_user', None)
+        return bool(user is not None and user.is_admin)
+
+    def cache_samples(self):
+        """Séries de hits/misses dos caches registrados, lidas no momento da coleta"""
+        for name, stats in sorted(self.caches.items()):
+            values = stats() or {}
+            for result in ('hits', 'misses'):
+                if result in values:
+                    yield f'cache_{result}_total', [('cache', name)], values[result]
+
+    def render(self):
+        """Todas as métricas no formato de exposição texto do Prometheus"""
+        lines = []
+        for metric in (self.requests, self.latency, self.response_size, self.query_count, self.query_time):
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        cache_samples = list(self.cache_samples())
+        for result in ('hits', 'misses'):
+            name = f'cache_{result}_total'
+            lines.append(f'# HELP {name} Consultas aos caches da aplicação com resultado {result}')
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{sample}{format_labels(labels)} {format_value(value)}'
+                         for sample, labels, value in cache_samples if sample == name)
+
+        return '\n'.join(lines) + '\n'
+
+# Instância global das métricas de requisição
+request_metrics = RequestMetrics()
@@ -1,10 +1,46 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import inspect
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
 from datetime import datetime
 import json
 
 db = SQLAlchemy()
 
+# Custo padrão do scrypt no Werkzeug (N, r, p)
+DEFAULT_SCRYPT_PARAMS = (32768, 8, 1)
+
+def resolve_password_method(method='scrypt', iterations=None):
+    """
+    Monta o método completo do Werkzeug, no formato gravado no início do hash.
+    
+    iterations é o número de iterações do pbkdf2 ou o N (potência de 2) do scrypt;
+    sem ele vale o que estiver no método ou o padrão do Werkzeug.
+    """
+    name, *params = method.split(':')
+    
+    if name == 'pbkdf2':
+        digest = params[0] if params else 'sha256'
+        iterations = iterations or (int(params[1]) if len(params) > 1 else DEFAULT_PBKDF2_ITERATIONS)
+        return f'pbkdf2:{digest}:{int(iterations)}'
+    
+    if name == 'scrypt':
+        n, r, p = [int(value) for value in params] + list(DEFAULT_SCRYPT_PARAMS[len(params):])
+        n = int(iterations or n)
+        if n < 2 or n & (n - 1):
+            # O hashlib só recusaria na hora de gerar o hash, em cada login
+            raise ValueError(f'N do scrypt deve ser uma potência de 2 maior que 1: {n}')
+        return f'scrypt:{n}:{r}:{p}'
+    
+    raise ValueError(f'Método de hash de senha inválido: {method} (use scrypt ou pbkdf2)')
+
+def password_hash_method():
+    """Método de hash configurado (PASSWORD_HASH_METHOD / PASSWORD_HASH_ITERATIONS)"""
+    if has_app_context() and current_app.config.get('PASSWORD_HASH_METHOD'):
+        return resolve_password_method(current_app.config['PASSWORD_HASH_METHOD'],
+                                       current_app.config.get('PASSWORD_HASH_ITERATIONS'))
+    return resolve_password_method()
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -20,16 +56,20 @@ class User(db.Model):
     def __init__(self, username, email, password, is_admin=True):
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=password_hash_method())
         self.is_admin = is_admin
     
     def check_password(self, password):
         """Verifica se a senha está correta"""
         return check_password_hash(self.password_hash, password)
     
+    def needs_rehash(self):
+        """Indica se o hash gravado usa parâmetros diferentes dos configurados"""
+        return self.password_hash.split('$', 1)[0] != password_hash_method()
+    
     def set_password(self, password):
         """Define uma nova senha"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=password_hash_method())
     
     def to_dict(self):
         """Converte o objeto para dicionário (sem senha)"""
@@ -43,8 +83,59 @@ class User(db.Model):
             'is_active': self.is_active
         }
 
+def decode_json_field(value, default):
+    """Decodifica uma coluna de texto JSON, devolvendo default se vazia ou inválida"""
+    try:
+        return json.loads(value) if value else default
+    except ValueError:
+        return default
+
+def normalize_tag(name):
+    """Forma canônica de uma tag usada na tabela normalizada (filtros e facetas)"""
+    return ' '.join(str(name).split()).lower()
+
+# Associação item <-> tag; o índice (tag_id, item_id) atende o filtro por tag
+portfolio_item_tags = db.Table(
+    'portfolio_item_tags',
+    db.Column('item_id', db.Integer, db.ForeignKey('portfolio_items.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_portfolio_item_tags_tag_item', 'tag_id', 'item_id')
+)
+
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # normalizado (normalize_tag)
+    
+    def __init__(self, name):
+        self.name = name
+    
+    @classmethod
+    def get_or_create(cls, names):
+        """Retorna as tags com os nomes informados, criando as que ainda não existem"""
+        names = list(dict.fromkeys(normalize_tag(name) for name in names if str(name).strip()))
+        if not names:
+            return []
+        
+        with db.session.no_autoflush:
+            existing = {tag.name: tag for tag in cls.query.filter(cls.name.in_(names)).all()}
+        
+        for name in names:
+            if name not in existing:
+                existing[name] = cls(name)
+                db.session.add(existing[name])
+        
+        return [existing[name] for name in names]
+
 class PortfolioItem(db.Model):
     __tablename__ = 'portfolio_items'
+    # Índices das listagens: filtro por is_active (+ category/type) ordenado por (created_at, id)
+    __table_args__ = (
+        db.Index('ix_portfolio_items_active_created', 'is_active', 'created_at', 'id'),
+        db.Index('ix_portfolio_items_active_category_created', 'is_active', 'category', 'created_at', 'id'),
+        db.Index('ix_portfolio_items_active_type_created', 'is_active', 'type', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -54,7 +145,9 @@ class PortfolioItem(db.Model):
     file_path = db.Column(db.String(500))  # Para arquivos de imagem/vídeo
     url = db.Column(db.String(500))  # Para links externos
     thumbnail_path = db.Column(db.String(500))  # Caminho da thumbnail
-    tags = db.Column(db.Text)  # JSON string com as tags
+    variants = db.Column(db.Text)  # JSON com as versões redimensionadas da imagem
+    media_info = db.Column(db.Text)  # JSON com duração e dimensões (vídeos)
+    tags = db.Column(db.Text)  # JSON string com as tags, na ordem e grafia originais (usada nas respostas)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
@@ -63,6 +156,9 @@ class PortfolioItem(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     creator = db.relationship('User', backref=db.backref('portfolio_items', lazy=True))
     
+    # Cópia normalizada das tags, usada apenas em filtros e facetas
+    tag_entries = db.relationship('Tag', secondary=portfolio_item_tags, lazy='select')
+    
     def __init__(self, title, description, category, type, file_path=None, url=None, thumbnail_path=None, tags=None, created_by=None):
         self.title = title
         self.description = description
@@ -71,7 +167,7 @@ class PortfolioItem(db.Model):
         self.file_path = file_path
         self.url = url
         self.thumbnail_path = thumbnail_path
-        self.tags = json.dumps(tags) if tags else json.dumps([])
+        self.set_tags(tags)
         self.created_by = created_by
     
     def get_tags(self):
@@ -82,30 +178,101 @@ class PortfolioItem(db.Model):
             return []
     
     def set_tags(self, tags_list):
-        """Define as tags a partir de uma lista"""
+        """Define as tags a partir de uma lista (coluna JSON e tabela normalizada)"""
         self.tags = json.dumps(tags_list) if tags_list else json.dumps([])
+        self.tag_entries = Tag.get_or_create(self.get_tags())
     
-    def to_dict(self):
-        """Converte o objeto para dicionário"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'category': self.category,
-            'type': self.type,
-            'file_path': self.file_path,
-            'url': self.url,
-            'thumbnail_path': self.thumbnail_path,
-            'tags': self.get_tags(),
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_active': self.is_active,
-            'created_by': self.created_by,
-            'creator_name': self.creator.username if self.creator else None
-        }
+    def get_variants(self):
+        """Retorna as versões redimensionadas da imagem como lista"""
+        try:
+            return json.loads(self.variants) if self.variants else []
+        except:
+            return []
+    
+    def get_media_info(self):
+        """Retorna os metadados de mídia (duração, largura, altura) como dicionário"""
+        try:
+            return json.loads(self.media_info) if self.media_info else None
+        except:
+            return None
+    
+    # Campos expostos pela API e as colunas necessárias para montar cada um
+    FIELD_COLUMNS = {
+        'id': ('id',),
+        'title': ('title',),
+        'description': ('description',),
+        'category': ('category',),
+        'type': ('type',),
+        'file_path': ('file_path',),
+        'url': ('url',),
+        'thumbnail_path': ('thumbnail_path',),
+        'variants': ('variants',),
+        'media_info': ('media_info',),
+        'tags': ('tags',),
+        'created_at': ('created_at',),
+        'updated_at': ('updated_at',),
+        'is_active': ('is_active',),
+        'created_by': ('created_by',),
+        'creator_name': ('created_by',)
+    }
+    
+    def to_dict(self, fields=None):
+        """Converte o objeto para dicionário (opcionalmente apenas com os campos informados)"""
+        if fields is None:
+            fields = self.FIELD_COLUMNS
+        
+        return {field: self._serialize_field(field) for field in fields}
+    
+    def _serialize_field(self, field):
+        """Serializa um único campo, acessando apenas as colunas que ele utiliza"""
+        if field == 'tags':
+            return self.get_tags()
+        if field == 'variants':
+            return self.get_variants()
+        if field == 'media_info':
+            return self.get_media_info()
+        if field in ('created_at', 'updated_at'):
+            value = getattr(self, field)
+            return value.isoformat() if value else None
+        if field == 'creator_name':
+            return self.creator.username if self.creator else None
+        return getattr(self, field)
+    
+    @classmethod
+    def row_columns(cls, fields=None):
+        """Colunas necessárias para serializar os campos a partir de tuplas (sem objetos ORM)"""
+        columns = {'id', 'created_at'}
+        for field in fields or cls.FIELD_COLUMNS:
+            columns.update(cls.FIELD_COLUMNS[field])
+        return [getattr(cls, column) for column in sorted(columns)]
+    
+    @classmethod
+    def rows_to_dicts(cls, rows, fields=None):
+        """
+        Serializa linhas obtidas com row_columns() (e creator_name, se pedido).
+        
+        Datas seguem como datetime para o provider JSON converter nativamente.
+        """
+        fields = tuple(fields or cls.FIELD_COLUMNS)
+        json_fields = [field for field in fields if field in ('tags', 'variants', 'media_info')]
+        
+        result = []
+        for row in rows:
+            data = row._asdict()
+            item = {field: data[field] for field in fields}
+            for field in json_fields:
+                item[field] = decode_json_field(data[field], None if field == 'media_info' else [])
+            result.append(item)
+        
+        return result
 
 class ContactMessage(db.Model):
     __tablename__ = 'contact_messages'
+    # Índices da listagem (ordenada por created_at) e da contagem de não lidas
+    __table_args__ = (
+        db.Index('ix_contact_messages_created', 'created_at'),
+        db.Index('ix_contact_messages_read_created', 'is_read', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -141,6 +308,13 @@ class ContactMessage(db.Model):
 
 class AdminSession(db.Model):
     __tablename__ = 'admin_sessions'
+    # Índices da validação por token, da desativação das sessões de um usuário
+    # e da limpeza das sessões expiradas
+    __table_args__ = (
+        db.Index('ix_admin_sessions_token_active', 'session_token', 'is_active'),
+        db.Index('ix_admin_sessions_user_active', 'user_id', 'is_active'),
+        db.Index('ix_admin_sessions_expires', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -172,3 +346,98 @@ class AdminSession(db.Model):
             'is_expired': self.is_expired()
         }
 
+class StoredFile(db.Model):
+    __tablename__ = 'stored_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(500), unique=True, nullable=False)  # uploads/ab/cd/<sha256>.<ext>
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)  # itens que usam o arquivo
+    thumbnail_path = db.Column(db.String(500))  # Thumbnail gerada em segundo plano
+    variants = db.Column(db.Text)  # JSON com as versões redimensionadas (imagens)
+    media_info = db.Column(db.Text)  # JSON com duração e dimensões (vídeos)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __init__(self, sha256, path, size):
+        self.sha256 = sha256
+        self.path = path
+        self.size = size
+        self.ref_count = 0
+    
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'path': self.path,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'thumbnail_path': self.thumbnail_path,
+            'variants': json.loads(self.variants) if self.variants else [],
+            'media_info': json.loads(self.media_info) if self.media_info else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+def ensure_columns():
+    """
+    Adiciona às tabelas existentes as colunas declaradas nos modelos que ainda não existem.
+    
+    Assim como os índices, colunas novas não são criadas por db.create_all() em
+    tabelas antigas. Apenas colunas que aceitam NULL são adicionadas.
+    """
+    created = []
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                created.append(f'{table.name}.{column.name}')
+    
+    return created
+
+def ensure_item_tags():
+    """
+    Preenche a tabela normalizada de tags a partir da coluna JSON.
+    
+    Executado na inicialização; só faz algo em bancos criados antes da tabela
+    existir (associação vazia com itens que têm tags). Retorna os itens preenchidos.
+    """
+    if db.session.query(portfolio_item_tags).first() is not None:
+        return 0
+    
+    items = PortfolioItem.query.filter(PortfolioItem.tags.isnot(None), PortfolioItem.tags != '[]').all()
+    for item in items:
+        item.tag_entries = Tag.get_or_create(item.get_tags())
+    
+    db.session.commit()
+    return len(items)
+
+def ensure_indexes():
+    """
+    Cria os índices declarados nos modelos que ainda não existem no banco.
+    
+    db.create_all() não altera tabelas já existentes, então bancos criados antes
+    da declaração dos índices (SQLite ou PostgreSQL) são atualizados por aqui.
+    """
+    created = []
+    existing_tables = set(inspect(db.engine).get_table_names())
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    
+    return created
@@ -0,0 +1,80 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+# Limites de paginação das listagens
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Converte o parâmetro limit da query string, respeitando o máximo permitido"""
+    if value is None or value == '':
+        return default
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Parâmetro limit deve ser um número inteiro')
+
+    if limit < 1:
+        raise ValueError('Parâmetro limit deve ser maior que zero')
+
+    return min(limit, maximum)
+
+def encode_cursor(created_at, item_id):
+    """Gera um cursor opaco a partir da chave (created_at, id) do último item da página"""
+    raw = f"{created_at.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decodifica um cursor gerado por encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        created_at, item_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Cursor inválido')
+
+def parse_fields(value, allowed_fields):
+    """Converte o parâmetro fields (lista separada por vírgulas) em uma tupla de campos válidos"""
+    if not value:
+        return None
+
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in allowed_fields:
+            raise ValueError(f'Campo inválido em fields: {field}')
+        if field not in fields:
+            fields.append(field)
+
+    return tuple(fields) or None
+
+def keyset_query(query, model, limit, cursor=None):
+    """Query da página: filtro pelo cursor, ordem (created_at DESC, id DESC) e limit + 1"""
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        # Comparação de tuplas na mesma ordem do índice (..., created_at, id): o banco
+        # posiciona a busca direto no cursor, com custo constante em qualquer página
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, item_id))
+
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def keyset_paginate(query, model, limit, cursor=None):
+    """
+    Aplica paginação por chave (created_at DESC, id DESC) a uma query.
+
+    Retorna a lista de itens (ou linhas) da página e o cursor da próxima página (ou None).
+    """
+    items = keyset_query(query, model, limit, cursor).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return items, next_cursor
@@ -0,0 +1,246 @@
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from flask import g, has_request_context, request
+from query_timing import query_timer
+
+def redact_parameters(parameters):
+    """Troca os valores dos parâmetros de uma consulta pelos seus tipos (não vaza dados no log)"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: um conjunto de parâmetros por linha
+            return {'rows': len(parameters), 'first': redact_parameters(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+def request_route():
+    """Rota que originou a consulta ('GET /api/portfolio/<int:item_id>'), ou None fora de requisições"""
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return f'{request.method} {rule}'
+
+class SlowQueryLog:
+    """
+    Registro das consultas SQL mais lentas que SLOW_QUERY_MS.
+
+    Cada consulta lenta é impressa em uma linha JSON (logs do Render/Vercel)
+    com a duração, o SQL, os parâmetros e a rota de origem, e as últimas
+    SLOW_QUERY_BUFFER ficam em memória para o painel. Os valores dos parâmetros
+    só aparecem com SLOW_QUERY_LOG_PARAMS; por padrão vão apenas os tipos.
+    """
+
+    def __init__(self, app=None):
+        self.threshold = 0.25
+        self.log_params = False
+        self.entries = deque(maxlen=100)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 250)
+        app.config.setdefault('SLOW_QUERY_LOG_PARAMS', False)
+        app.config.setdefault('SLOW_QUERY_BUFFER', 100)
+
+        self.threshold = float(app.config['SLOW_QUERY_MS']) / 1000
+        self.log_params = bool(app.config['SLOW_QUERY_LOG_PARAMS'])
+        self.entries = deque(maxlen=int(app.config['SLOW_QUERY_BUFFER']))
+        if self.threshold <= 0:
+            return
+
+        query_timer.observe(app, self._record_query)
+
+    def _record_query(self, statement, parameters, elapsed):
+        if elapsed < self.threshold:
+            return
+
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 1),
+            'statement': re.sub(r'\s+', ' ', statement).strip()[:2000],
+            'params': parameters if self.log_params else redact_parameters(parameters),
+            'route': request_route()
+        }
+        with self._lock:
+            self.entries.append(entry)
+        print(f"SLOW QUERY {json.dumps(entry, default=str, ensure_ascii=False)}")
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self.entries))
+
+class StackSampler:
+    """Amostra, em uma thread, a pilha de outra thread a cada intervalo e conta as pilhas iguais"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        # A primeira amostra é imediata: requisições mais curtas que o intervalo
+        # ainda geram um perfil
+        while True:
+            self._sample()
+            if self._stopping.wait(self.interval):
+                return
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f'{os.path.basename(code.co_filename)}:{code.co_qualname}')
+            frame = frame.f_back
+        if frames:
+            self.stacks[';'.join(reversed(frames))] += 1
+
+    def collapsed(self):
+        """Pilhas no formato "collapsed" (flamegraph.pl, speedscope): 'a;b;c contagem' por linha"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+class RequestProfiler:
+    """
+    Profiler por amostragem, ligado por requisição às rotas de um blueprint
+    (PROFILER_BLUEPRINT, a API por padrão).
+
+    Uma requisição é perfilada quando traz o cabeçalho PROFILER_HEADER com o
+    valor de PROFILER_TOKEN, ou quando um administrador armou o profiler para
+    as próximas N requisições (arm). As pilhas amostradas a cada
+    PROFILER_INTERVAL_MS vão para um arquivo .folded em PROFILER_OUTPUT_DIR,
+    cujo nome volta no mesmo cabeçalho da resposta. Sem token e sem armar,
+    o custo por requisição é uma verificação de cabeçalho.
+    """
+
+    def __init__(self, app=None):
+        self.output_dir = None
+        self.blueprint = 'api'
+        self.header = 'X-Profile'
+        self.token = None
+        self.interval = 0.005
+        self.max_files = 100
+        self.armed = 0
+        self.enabled = False
+        # Endpoints que nunca são perfilados (as próprias rotas do profiler)
+        self.exempt_endpoints = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registra os hooks na aplicação. Eles filtram pelo blueprint na própria
+        requisição: hooks no blueprint global só podem ser registrados uma vez,
+        e create_app() pode rodar mais de uma vez no mesmo processo.
+        """
+        app.config.setdefault('PROFILER_BLUEPRINT', 'api')
+        app.config.setdefault('PROFILER_OUTPUT_DIR', os.path.join(app.root_path, 'profiles'))
+        app.config.setdefault('PROFILER_HEADER', 'X-Profile')
+        app.config.setdefault('PROFILER_TOKEN', None)
+        app.config.setdefault('PROFILER_INTERVAL_MS', 5)
+        app.config.setdefault('PROFILER_MAX_FILES', 100)
+        app.config.setdefault('PROFILER_EXEMPT_ENDPOINTS', (
+            'api.get_profiler_status', 'api.arm_profiler', 'api.download_profile'
+        ))
+
+        self.blueprint = app.config['PROFILER_BLUEPRINT']
+        self.output_dir = app.config['PROFILER_OUTPUT_DIR']
+        self.header = app.config['PROFILER_HEADER']
+        self.token = app.config['PROFILER_TOKEN']
+        self.interval = float(app.config['PROFILER_INTERVAL_MS']) / 1000
+        self.max_files = int(app.config['PROFILER_MAX_FILES'])
+        self.exempt_endpoints = set(app.config['PROFILER_EXEMPT_ENDPOINTS'])
+        self.enabled = True
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def arm(self, requests):
+        """Perfila as próximas `requests` requisições do blueprint"""
+        with self._lock:
+            self.armed = max(int(requests), 0)
+            return self.armed
+
+    def _should_profile(self):
+        """Motivo para perfilar a requisição ('token' ou 'armed'), ou None"""
+        if request.blueprint != self.blueprint or request.endpoint in self.exempt_endpoints:
+            return None
+
+        value = request.headers.get(self.header)
+        if value and self.token and hmac.compare_digest(value, self.token):
+            return 'token'
+
+        # A vaga armada só é consumida quando o perfil é gravado (after_request)
+        return 'armed' if self.armed else None
+
+    def before_request(self):
+        reason = self._should_profile()
+        if reason is None:
+            return
+        g.profiler = StackSampler(threading.get_ident(), self.interval)
+        g.profiler_reason = reason
+        g.profiler.start()
+
+    def after_request(self, response):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return response
+
+        sampler.stop()
+        if sampler.stacks:
+            name = self.save(sampler)
+            response.headers[self.header] = name
+            if g.pop('profiler_reason', None) == 'armed':
+                with self._lock:
+                    self.armed = max(self.armed - 1, 0)
+        return response
+
+    def teardown_request(self, exception):
+        # Exceção não tratada: after_request não rodou, apenas encerra a amostragem
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            sampler.stop()
+
+    def save(self, sampler):
+        """Grava as pilhas da requisição atual e retorna o nome do arquivo"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{endpoint}.folded"
+        with open(os.path.join(self.output_dir, name), 'w') as output:
+            output.write(sampler.collapsed())
+
+        for old in self.profiles()[self.max_files:]:
+            os.remove(os.path.join(self.output_dir, old['name']))
+        return name
+
+    def profiles(self):
+        """Arquivos gravados, do mais recente ao mais antigo"""
+        if not self.output_dir or not os.path.isdir(self.output_dir):
+            return []
+        entries = [entry for entry in os.scandir(self.output_dir) if entry.name.endswith('.folded')]
+        return [
+            {'name': entry.name, 'size': entry.stat().st_size}
+            for entry in sorted(entries, key=lambda entry: entry.name, reverse=True)
+        ]
+
+# Instâncias globais do log de consultas lentas e do profiler das rotas da API
+slow_query_log = SlowQueryLog()
+request_profiler = RequestProfiler()
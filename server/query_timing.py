@@ -0,0 +1,49 @@
+import time
+from sqlalchemy import event
+from models import db
+
+class QueryTimer:
+    """
+    Mede a duração de cada consulta SQL pelos eventos do engine e a repassa aos
+    observadores registrados (métricas por requisição, log de consultas lentas).
+
+    O início de cada consulta fica em conn.info, em pilha; quando a consulta
+    falha, after_cursor_execute não roda e o handle_error descarta o início.
+    """
+
+    def __init__(self):
+        # Funções chamadas com (statement, parameters, duração em segundos)
+        self.observers = []
+
+    def observe(self, app, observer):
+        """Registra o observador e os eventos nos engines da aplicação (com app context)"""
+        if observer not in self.observers:
+            self.observers.append(observer)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                # create_app() pode rodar mais de uma vez com os mesmos engines
+                if event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+                    continue
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+                event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        for observer in self.observers:
+            observer(statement, parameters, elapsed)
+
+# Instância global: um único conjunto de eventos por engine para todos os observadores
+query_timer = QueryTimer()
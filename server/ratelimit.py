@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+
+# Duração, em segundos, das unidades aceitas nos limites ("5/minute")
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_limit_rule(rule):
+    """Converte '5/minute' em (5, 60)"""
+    try:
+        amount, unit = rule.split('/')
+        return int(amount), PERIODS[unit.strip().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f'Limite inválido: {rule} (use N/second, N/minute, N/hour ou N/day)')
+
+class MemoryCounterStore:
+    """
+    Contadores com expiração em memória, limitados a max_keys chaves (LRU).
+
+    Quando o limite de chaves é atingido, as menos usadas são descartadas; a
+    memória fica constante mesmo sob ataques com muitos IPs/usuários diferentes.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, key, ttl):
+        """Incrementa o contador (criando-o com a expiração informada) e retorna o novo valor"""
+        now = time.monotonic()
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            if expires_at is None or expires_at <= now:
+                value, expires_at = 0, now + ttl
+            self._data[key] = (value + 1, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+            return value + 1
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            if expires_at is None or expires_at <= time.monotonic():
+                return 0
+            return value
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'max_size': self.max_keys}
+
+class RedisCounterStore:
+    """Contadores compartilhados entre processos em um servidor compatível com Redis"""
+
+    def __init__(self, url, prefix='asteca2:ratelimit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('O backend redis requer o pacote "redis" (pip install redis)')
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def incr(self, key, ttl):
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.prefix + key)
+        pipeline.expire(self.prefix + key, int(math.ceil(ttl)))
+        return pipeline.execute()[0]
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def stats(self):
+        return {}
+
+def client_ip():
+    """
+    IP do cliente. Atrás de proxy, o ProxyFix (PROXY_HOPS em main.py) já trocou
+    o remote_addr pela entrada do X-Forwarded-For adicionada pelo último proxy
+    confiável; as entradas à esquerda vêm do cliente e não são usadas.
+    """
+    return request.remote_addr
+
+def json_username():
+    """Username enviado no corpo JSON (normalizado), ou None"""
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+class RateLimiter:
+    """
+    Limite de requisições por janela deslizante (aproximada por duas janelas fixas).
+
+    As rotas declaram os limites com o decorador limit(); cada limite tem um
+    escopo e uma função que extrai a chave da requisição (IP, username...).
+    Requisições acima do limite recebem 429 com Retry-After. O backend 'memory'
+    é por processo; 'redis' compartilha os contadores entre workers.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.store = MemoryCounterStore()
+        self.overrides = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATELIMIT_STORE_SIZE', 10000)
+        app.config.setdefault('RATELIMIT_REDIS_URL', 'redis://localhost:6379/0')
+        # Substitui o limite declarado em uma rota: {'login-ip': '20/minute'}
+        app.config.setdefault('RATELIMIT_OVERRIDES', {})
+
+        backend = app.config['RATELIMIT_BACKEND']
+        if backend == 'memory':
+            self.store = MemoryCounterStore(int(app.config['RATELIMIT_STORE_SIZE']))
+        elif backend == 'redis':
+            self.store = RedisCounterStore(app.config['RATELIMIT_REDIS_URL'])
+        else:
+            raise ValueError(f'RATELIMIT_BACKEND inválido: {backend}')
+
+        self.enabled = bool(app.config['RATELIMIT_ENABLED'])
+        self.overrides = {scope: parse_limit_rule(rule) for scope, rule in app.config['RATELIMIT_OVERRIDES'].items()}
+
+    def hit(self, scope, identity, amount, period):
+        """
+        Registra uma requisição e retorna None se permitida, ou os segundos até
+        a próxima tentativa possível.
+        """
+        now = time.time()
+        window = int(now // period)
+        key = f'{scope}:{identity}:{window}'
+
+        current = self.store.incr(key, period * 2)
+        previous = self.store.get(f'{scope}:{identity}:{window - 1}')
+
+        # Peso da janela anterior proporcional ao quanto dela ainda cabe na janela deslizante
+        elapsed = (now % period) / period
+        if previous * (1 - elapsed) + current <= amount:
+            return None
+
+        return max(int(math.ceil(period - now % period)), 1)
+
+    def limit(self, rule, key=client_ip, scope=None):
+        """Decorador que aplica o limite 'N/unidade' à rota, por chave extraída da requisição"""
+        default = parse_limit_rule(rule)
+
+        def decorator(view):
+            name = scope or view.__name__
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                identity = key() if self.enabled else None
+                if identity is not None:
+                    amount, period = self.overrides.get(name, default)
+                    retry_after = self.hit(name, identity, amount, period)
+                    if retry_after is not None:
+                        response = jsonify({'error': f'Muitas requisições, tente novamente em {retry_after} segundos'})
+                        response.headers['Retry-After'] = str(retry_after)
+                        return response, 429
+                return view(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return dict(self.store.stats(), enabled=self.enabled)
+
+# Instância global do limitador de requisições
+rate_limiter = RateLimiter()
@@ -1,29 +1,83 @@
-from flask import Blueprint, request, jsonify, make_response
-from werkzeug.utils import secure_filename
-from models import User, PortfolioItem, ContactMessage, AdminSession
+from flask import Blueprint, request, jsonify, make_response, current_app, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import func, case, literal
+from models import db, User, PortfolioItem, ContactMessage, AdminSession, Tag, portfolio_item_tags, normalize_tag
 from auth import auth_manager, require_auth, require_admin
-import os
-import uuid
+from pagination import parse_limit, parse_fields, keyset_paginate
+from conditional import collection_version, make_etag, not_modified_response, set_cache_validators
+from cache import LRUCache, response_cache, PORTFOLIO_CACHE_NAMESPACE
+from compression import response_compressor
+from uploads import (UploadError, save_upload, resumable_uploads, update_references,
+                     CHUNK_SIZE, MAX_VIDEO_SIZE)
+from contact_queue import contact_queue, ContactQueueFull
+from ratelimit import rate_limiter, client_ip, json_username
+from engine_profiles import pool_stats
 from datetime import datetime
 
 # Cria o blueprint para as rotas da API
 api_bp = Blueprint('api', __name__)
 
-# Configurações para upload de arquivos
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi', 'webm'}
+# Cache curto das estatísticas do painel (limpo a cada escrita neste processo)
+admin_stats_cache = LRUCache(max_size=1)
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def select_rows(query, fields=None):
+    """
+    Troca as entidades da query pelas colunas necessárias aos campos pedidos.
+    
+    As listagens serializam tuplas (PortfolioItem.rows_to_dicts) em vez de montar
+    objetos ORM; o nome do criador vem do mesmo SELECT (evita N+1).
+    """
+    query = query.with_entities(*PortfolioItem.row_columns(fields))
+    if fields is None or 'creator_name' in fields:
+        query = query.outerjoin(User, User.id == PortfolioItem.created_by) \
+            .add_columns(User.username.label('creator_name'))
+    return query
 
-def ensure_upload_folder():
-    """Garante que a pasta de uploads existe"""
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+def parse_tags(values, mode=None):
+    """Lê ?tag= (repetido ou separado por vírgulas) e ?tag_mode=all|any"""
+    names = list(dict.fromkeys(
+        normalize_tag(name) for value in values for name in value.split(',') if name.strip()
+    ))
+    mode = mode or 'all'
+    if mode not in ('all', 'any'):
+        raise ValueError('tag_mode deve ser all ou any')
+    return names, mode
+
+def filter_by_tags(query, names, mode='all'):
+    """Restringe a query aos itens com todas (all) ou alguma (any) das tags, via tabela normalizada"""
+    if not names:
+        return query
+    
+    matching = db.session.query(portfolio_item_tags.c.item_id) \
+        .join(Tag, Tag.id == portfolio_item_tags.c.tag_id) \
+        .filter(Tag.name.in_(names))
+    if mode == 'all':
+        matching = matching.group_by(portfolio_item_tags.c.item_id) \
+            .having(func.count(portfolio_item_tags.c.tag_id) == len(names))
+    
+    return query.filter(PortfolioItem.id.in_(matching))
+
+# Mensagens inseridas pelo flusher da fila de contato alteram as estatísticas do painel
+contact_queue.flush_callbacks.append(lambda count: admin_stats_cache.clear())
+
+def invalidate_portfolio_caches():
+    """Invalida as respostas em cache que dependem dos itens do portfólio"""
+    response_cache.bump_version(PORTFOLIO_CACHE_NAMESPACE)
+    admin_stats_cache.clear()
+
+def enqueue_video_job(upload):
+    """Agenda a extração de poster e metadados de um vídeo recém-enviado (exceto duplicados)"""
+    from media import is_video, VIDEO_METADATA_JOB
+    from jobs import job_queue
+    if not is_video(upload['file_path']) or upload.get('duplicate'):
+        return None
+    return job_queue.enqueue(VIDEO_METADATA_JOB, {'file_path': upload['file_path']})
 
 # ===== ROTAS DE AUTENTICAÇÃO =====
 
 @api_bp.route('/auth/login', methods=['POST'])
+@rate_limiter.limit('10/minute', key=client_ip, scope='login-ip')
+@rate_limiter.limit('5/minute', key=json_username, scope='login-user')
 def login():
     """Rota para login de usuários"""
     try:
@@ -107,14 +161,18 @@ def change_password():
         if not data or not data.get('current_password') or not data.get('new_password'):
             return jsonify({'error': 'Senha atual e nova senha são obrigatórias'}), 400
         
-        user = request.current_user
+        user = User.query.get(request.current_user.id)
         
-        if not user.check_password(data['current_password']):
+        if not user or not user.check_password(data['current_password']):
             return jsonify({'error': 'Senha atual incorreta'}), 400
         
         user.set_password(data['new_password'])
         db.session.commit()
         
+        # Sessões em cache guardam um snapshot do usuário anterior à troca; no
+        # backend token, os tokens emitidos com a senha antiga são revogados
+        auth_manager.invalidate_user_sessions(user.id)
+        
         return jsonify({'message': 'Senha alterada com sucesso'})
         
     except Exception as e:
@@ -124,27 +182,176 @@ def change_password():
 
 @api_bp.route('/portfolio', methods=['GET'])
 def get_portfolio_items():
-    """Retorna todos os itens do portfólio ativos"""
+    """Retorna os itens ativos do portfólio, paginados por cursor"""
     try:
         # Parâmetros de filtro opcionais
         category = request.args.get('category')
         item_type = request.args.get('type')
         
-        query = PortfolioItem.query.filter_by(is_active=True)
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            fields = parse_fields(request.args.get('fields'), PortfolioItem.FIELD_COLUMNS)
+            cursor = request.args.get('cursor')
+            tags, tag_mode = parse_tags(request.args.getlist('tag'), request.args.get('tag_mode'))
+            
+            # Respostas já codificadas, por filtro e página, válidas até a próxima escrita
+            cache_key = response_cache.key(PORTFOLIO_CACHE_NAMESPACE, category, item_type,
+                                           ','.join(tags), tag_mode, limit, cursor, ','.join(fields or ()))
+            cached = response_cache.get(cache_key)
+            if cached:
+                not_modified = not_modified_response(cached['etag'], cached['last_modified'])
+                if not_modified:
+                    return not_modified
+                response = response_compressor.cached_response(cache_key, cached)
+                return set_cache_validators(response, cached['etag'], cached['last_modified'])
+            
+            query = PortfolioItem.query.filter_by(is_active=True)
+            
+            if category:
+                query = query.filter_by(category=category)
+            
+            if item_type:
+                query = query.filter_by(type=item_type)
+            
+            query = filter_by_tags(query, tags, tag_mode)
+            
+            # Validadores derivados de um agregado barato; se o cliente já tem
+            # esta versão, nem a página é consultada nem o JSON é gerado
+            count, last_modified = collection_version(query, PortfolioItem)
+            etag = make_etag('portfolio', category, item_type, ','.join(tags), tag_mode, limit, cursor,
+                             ','.join(fields or ()), count, last_modified)
+            
+            not_modified = not_modified_response(etag, last_modified)
+            if not_modified:
+                return not_modified
+            
+            rows, next_cursor = keyset_paginate(select_rows(query, fields), PortfolioItem, limit, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        response = jsonify({
+            'items': PortfolioItem.rows_to_dicts(rows, fields),
+            # Total de itens do filtro (todas as páginas), já contado para o ETag
+            'total': count,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
         
-        if category:
-            query = query.filter_by(category=category)
+        entry = {
+            'body': response.get_data(),
+            'etag': etag,
+            'last_modified': last_modified
+        }
+        response_cache.set(cache_key, entry)
         
-        if item_type:
-            query = query.filter_by(type=item_type)
+        # A versão comprimida é guardada na mesma entrada do cache
+        response = response_compressor.cached_response(cache_key, entry)
         
-        items = query.order_by(PortfolioItem.created_at.desc()).all()
+        return set_cache_validators(response, etag, last_modified)
         
-        return jsonify({
-            'items': [item.to_dict() for item in items],
-            'total': len(items)
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/portfolio/search', methods=['GET'])
+def search_portfolio_items():
+    """Busca textual nos itens ativos (título, descrição e tags), ordenada por relevância"""
+    from search import search_portfolio
+    try:
+        query_text = (request.args.get('q') or '').strip()
+        category = request.args.get('category')
+        item_type = request.args.get('type')
+        
+        if not query_text:
+            return jsonify({'error': 'Parâmetro q é obrigatório'}), 400
+        
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            fields = parse_fields(request.args.get('fields'), PortfolioItem.FIELD_COLUMNS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Resultados ordenados por relevância não têm chave estável; paginação por offset
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        # Buscas repetidas vêm do cache até a próxima escrita no portfólio
+        cache_key = response_cache.key(PORTFOLIO_CACHE_NAMESPACE, 'search', query_text.lower(),
+                                       category, item_type, limit, offset, ','.join(fields or ()))
+        cached = response_cache.get(cache_key)
+        if cached:
+            response = response_compressor.cached_response(cache_key, cached)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        ids, has_more = search_portfolio(query_text, limit, offset, category, item_type)
+        
+        rows = []
+        if ids:
+            query = select_rows(PortfolioItem.query.filter(PortfolioItem.id.in_(ids)), fields)
+            by_id = {row.id: row for row in query.all()}
+            rows = [by_id[item_id] for item_id in ids if item_id in by_id]
+        
+        response = jsonify({
+            'items': PortfolioItem.rows_to_dicts(rows, fields),
+            'total': len(rows),
+            'offset': offset,
+            'next_offset': offset + limit if has_more else None,
+            'has_more': has_more
         })
         
+        entry = {'body': response.get_data()}
+        response_cache.set(cache_key, entry)
+        
+        response = response_compressor.cached_response(cache_key, entry)
+        response.headers['Cache-Control'] = 'no-cache'
+        
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/portfolio/facets', methods=['GET'])
+def get_portfolio_facets():
+    """Contagem de itens ativos por tag e por categoria (opcionalmente de um tipo)"""
+    try:
+        item_type = request.args.get('type')
+        
+        cache_key = response_cache.key(PORTFOLIO_CACHE_NAMESPACE, 'facets', item_type)
+        cached = response_cache.get(cache_key)
+        if cached:
+            response = response_compressor.cached_response(cache_key, cached)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        active = db.session.query(PortfolioItem.id, PortfolioItem.category).filter_by(is_active=True)
+        if item_type:
+            active = active.filter_by(type=item_type)
+        active = active.subquery()
+        
+        # As duas contagens saem de uma única consulta agrupada (UNION ALL)
+        tag_counts = db.session.query(literal('tag'), Tag.name, func.count()) \
+            .select_from(active) \
+            .join(portfolio_item_tags, portfolio_item_tags.c.item_id == active.c.id) \
+            .join(Tag, Tag.id == portfolio_item_tags.c.tag_id) \
+            .group_by(Tag.name)
+        category_counts = db.session.query(literal('category'), active.c.category, func.count()) \
+            .group_by(active.c.category)
+        
+        facets = {'tag': [], 'category': []}
+        for facet, value, count in tag_counts.union_all(category_counts).all():
+            facets[facet].append({'name': value, 'count': count})
+        for values in facets.values():
+            values.sort(key=lambda entry: (-entry['count'], entry['name']))
+        
+        response = jsonify({'tags': facets['tag'], 'categories': facets['category']})
+        
+        entry = {'body': response.get_data()}
+        response_cache.set(cache_key, entry)
+        
+        response = response_compressor.cached_response(cache_key, entry)
+        response.headers['Cache-Control'] = 'no-cache'
+        
+        return response
+        
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
@@ -157,7 +364,15 @@ def get_portfolio_item(item_id):
         if not item:
             return jsonify({'error': 'Item não encontrado'}), 404
         
-        return jsonify({'item': item.to_dict()})
+        etag = make_etag('portfolio-item', item.id, item.updated_at)
+        
+        not_modified = not_modified_response(etag, item.updated_at)
+        if not_modified:
+            return not_modified
+        
+        response = jsonify({'item': item.to_dict()})
+        
+        return set_cache_validators(response, etag, item.updated_at)
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
@@ -166,6 +381,7 @@ def get_portfolio_item(item_id):
 @require_admin
 def create_portfolio_item():
     """Cria um novo item no portfólio"""
+    from media import attach_variants
     try:
         data = request.get_json()
         
@@ -193,9 +409,12 @@ def create_portfolio_item():
             tags=data.get('tags', []),
             created_by=request.current_user.id
         )
+        attach_variants(item)
         
         db.session.add(item)
         db.session.commit()
+        invalidate_portfolio_caches()
+        update_references(item.file_path, item.thumbnail_path)
         
         return jsonify({
             'message': 'Item criado com sucesso',
@@ -209,6 +428,7 @@ def create_portfolio_item():
 @require_admin
 def update_portfolio_item(item_id):
     """Atualiza um item do portfólio"""
+    from media import attach_variants
     try:
         item = PortfolioItem.query.get(item_id)
         
@@ -220,6 +440,8 @@ def update_portfolio_item(item_id):
         if not data:
             return jsonify({'error': 'Dados não fornecidos'}), 400
         
+        previous_paths = (item.file_path, item.thumbnail_path)
+        
         # Atualiza campos fornecidos
         if 'title' in data:
             item.title = data['title']
@@ -229,8 +451,11 @@ def update_portfolio_item(item_id):
             item.category = data['category']
         if 'type' in data and data['type'] in ['image', 'video', 'link']:
             item.type = data['type']
-        if 'file_path' in data:
+        if 'file_path' in data and data['file_path'] != item.file_path:
             item.file_path = data['file_path']
+            item.variants = None
+            item.media_info = None
+            attach_variants(item)
         if 'url' in data:
             item.url = data['url']
         if 'thumbnail_path' in data:
@@ -242,6 +467,8 @@ def update_portfolio_item(item_id):
         
         item.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_portfolio_caches()
+        update_references(*previous_paths, item.file_path, item.thumbnail_path)
         
         return jsonify({
             'message': 'Item atualizado com sucesso',
@@ -265,6 +492,7 @@ def delete_portfolio_item(item_id):
         item.is_active = False
         item.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_portfolio_caches()
         
         return jsonify({'message': 'Item deletado com sucesso'})
         
@@ -274,29 +502,40 @@ def delete_portfolio_item(item_id):
 @api_bp.route('/admin/portfolio', methods=['GET'])
 @require_admin
 def get_admin_portfolio_items():
-    """Retorna todos os itens do portfólio para administração (incluindo inativos)"""
+    """Retorna os itens do portfólio para administração (incluindo inativos), paginados por cursor"""
     try:
         # Parâmetros de filtro opcionais
         category = request.args.get('category')
         item_type = request.args.get('type')
         include_inactive = request.args.get('include_inactive', 'false').lower() == 'true'
         
-        query = PortfolioItem.query
-        
-        if not include_inactive:
-            query = query.filter_by(is_active=True)
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        if item_type:
-            query = query.filter_by(type=item_type)
-        
-        items = query.order_by(PortfolioItem.created_at.desc()).all()
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            fields = parse_fields(request.args.get('fields'), PortfolioItem.FIELD_COLUMNS)
+            cursor = request.args.get('cursor')
+            
+            query = PortfolioItem.query
+            
+            if not include_inactive:
+                query = query.filter_by(is_active=True)
+            
+            if category:
+                query = query.filter_by(category=category)
+            
+            if item_type:
+                query = query.filter_by(type=item_type)
+            
+            rows, next_cursor = keyset_paginate(select_rows(query, fields), PortfolioItem, limit, cursor)
+            # Total de itens do filtro (todas as páginas)
+            total = query.count()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'items': [item.to_dict() for item in items],
-            'total': len(items)
+            'items': PortfolioItem.rows_to_dicts(rows, fields),
+            'total': total,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except Exception as e:
@@ -307,33 +546,139 @@ def get_admin_portfolio_items():
 @api_bp.route('/admin/upload', methods=['POST'])
 @require_admin
 def upload_file():
-    """Upload de arquivos para o servidor"""
+    """
+    Upload de arquivos para o servidor, gravado em disco em blocos.
+    
+    Aceita multipart (campo file) ou o corpo bruto com ?filename=, que é copiado
+    direto do stream da requisição sem passar pelo parser de formulários.
+    """
+    from media import image_processor
     try:
-        ensure_upload_folder()
+        if request.mimetype == 'multipart/form-data':
+            # O limite por tipo só é conhecido após o parse; antes dele vale o maior limite
+            if request.content_length and request.content_length > MAX_VIDEO_SIZE + CHUNK_SIZE:
+                raise UploadError(f'Arquivo excede o limite de {MAX_VIDEO_SIZE // (1024 * 1024)} MB', 413)
+            
+            if 'file' not in request.files:
+                return jsonify({'error': 'Nenhum arquivo fornecido'}), 400
+            
+            file = request.files['file']
+            result = save_upload(file.stream, file.filename)
+        else:
+            result = save_upload(request.stream, request.args.get('filename', ''), request.content_length)
         
-        if 'file' not in request.files:
-            return jsonify({'error': 'Nenhum arquivo fornecido'}), 400
+        # Thumbnail e versões (imagens) ou poster e metadados (vídeos) são gerados em segundo plano
+        result['variants_pending'] = image_processor.submit(result['file_path'])
+        result['job_id'] = enqueue_video_job(result)
         
-        file = request.files['file']
+        return jsonify(dict(result, message='Arquivo enviado com sucesso'))
         
-        if file.filename == '':
-            return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Arquivo excede o tamanho máximo permitido'}), 413
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/uploads', methods=['POST'])
+@require_admin
+def create_resumable_upload():
+    """Inicia um upload retomável (para vídeos grandes), informando nome e tamanho"""
+    try:
+        data = request.get_json()
         
-        if file and allowed_file(file.filename):
-            # Gera nome único para o arquivo
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-            
-            file.save(file_path)
-            
-            return jsonify({
-                'message': 'Arquivo enviado com sucesso',
-                'file_path': file_path,
-                'original_filename': filename
-            })
+        if not data or not data.get('filename') or not data.get('size'):
+            return jsonify({'error': 'Campos filename e size são obrigatórios'}), 400
         
-        return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+        return jsonify(resumable_uploads.create(data['filename'], data['size'])), 201
+        
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/uploads/<upload_id>', methods=['GET'])
+@require_admin
+def get_resumable_upload(upload_id):
+    """Retorna o offset atual de um upload retomável"""
+    try:
+        return jsonify(resumable_uploads.status(upload_id))
+        
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/uploads/<upload_id>', methods=['PATCH'])
+@require_admin
+def append_resumable_upload(upload_id):
+    """Envia um bloco do arquivo; o header Upload-Offset indica a posição do bloco"""
+    from media import image_processor
+    try:
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'error': 'Header Upload-Offset é obrigatório'}), 400
+        
+        result = resumable_uploads.append(upload_id, offset, request.stream)
+        
+        if result['complete']:
+            result['variants_pending'] = image_processor.submit(result['file_path'])
+            result['job_id'] = enqueue_video_job(result)
+            result['message'] = 'Arquivo enviado com sucesso'
+        
+        return jsonify(result)
+        
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/uploads/<upload_id>', methods=['DELETE'])
+@require_admin
+def abort_resumable_upload(upload_id):
+    """Cancela um upload retomável e descarta os dados parciais"""
+    try:
+        resumable_uploads.abort(upload_id)
+        
+        return jsonify({'message': 'Upload cancelado'})
+        
+    except UploadError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/jobs', methods=['GET'])
+@require_admin
+def get_jobs():
+    """Retorna os jobs em segundo plano mais recentes e a contagem por estado"""
+    from jobs import job_queue
+    try:
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'jobs': job_queue.list(status=request.args.get('status'), limit=limit),
+            'counts': job_queue.counts()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/jobs/<int:job_id>', methods=['GET'])
+@require_admin
+def get_job(job_id):
+    """Retorna o estado de um job em segundo plano"""
+    from jobs import job_queue
+    try:
+        job = job_queue.get(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        
+        return jsonify({'job': job})
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
@@ -341,6 +686,7 @@ def upload_file():
 # ===== ROTAS DE CONTATO =====
 
 @api_bp.route('/contact', methods=['POST'])
+@rate_limiter.limit('5/minute', key=client_ip, scope='contact-ip')
 def create_contact_message():
     """Cria uma nova mensagem de contato"""
     try:
@@ -354,17 +700,35 @@ def create_contact_message():
             if not data.get(field):
                 return jsonify({'error': f'Campo {field} é obrigatório'}), 400
         
-        message = ContactMessage(
-            name=data['name'],
-            email=data['email'],
-            phone=data.get('phone'),
-            subject=data['subject'],
-            message=data['message'],
-            project_type=data.get('project_type')
-        )
+        fields = {
+            'name': data['name'],
+            'email': data['email'],
+            'phone': data.get('phone'),
+            'subject': data['subject'],
+            'message': data['message'],
+            'project_type': data.get('project_type')
+        }
+        
+        if contact_queue.enabled:
+            # Confirma assim que a mensagem está na fila local; o flusher insere em lote
+            try:
+                queue_id = contact_queue.enqueue(fields)
+            except ContactQueueFull:
+                response = jsonify({'error': 'Muitas mensagens no momento, tente novamente em instantes'})
+                response.headers['Retry-After'] = str(max(int(contact_queue.flush_interval), 1))
+                return response, 503
+            
+            return jsonify({
+                'message': 'Mensagem enviada com sucesso',
+                'queued': True,
+                'queue_id': queue_id
+            }), 202
+        
+        message = ContactMessage(**fields)
         
         db.session.add(message)
         db.session.commit()
+        admin_stats_cache.clear()
         
         return jsonify({
             'message': 'Mensagem enviada com sucesso',
@@ -401,6 +765,7 @@ def mark_message_as_read(message_id):
         
         message.is_read = True
         db.session.commit()
+        admin_stats_cache.clear()
         
         return jsonify({'message': 'Mensagem marcada como lida'})
         
@@ -409,30 +774,137 @@ def mark_message_as_read(message_id):
 
 # ===== ROTAS DE ESTATÍSTICAS =====
 
+@api_bp.route('/admin/cache', methods=['GET'])
+@require_admin
+def get_cache_stats():
+    """Retorna as métricas (acertos, falhas e taxa de acerto) dos caches da aplicação"""
+    try:
+        stats = {
+            'responses': response_cache.stats(),
+            'admin_stats': admin_stats_cache.stats(),
+            'rate_limits': rate_limiter.stats()
+        }
+        
+        session_cache = getattr(auth_manager.backend, 'cache', None)
+        if session_cache is not None:
+            stats['sessions'] = session_cache.stats()
+        
+        return jsonify(stats)
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/db', methods=['GET'])
+@require_admin
+def get_db_stats():
+    """Retorna o perfil do engine e o estado do pool de conexões"""
+    try:
+        return jsonify(pool_stats(current_app, db.engine))
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/slow-queries', methods=['GET'])
+@require_admin
+def get_slow_queries():
+    """Retorna as consultas SQL lentas mais recentes deste processo"""
+    from profiling import slow_query_log
+    try:
+        return jsonify({
+            'threshold_ms': current_app.config['SLOW_QUERY_MS'],
+            'queries': slow_query_log.recent()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/profiler', methods=['GET'])
+@require_admin
+def get_profiler_status():
+    """Lista os perfis gravados e quantas requisições ainda serão perfiladas"""
+    from profiling import request_profiler
+    try:
+        return jsonify({
+            'enabled': request_profiler.enabled,
+            'armed': request_profiler.armed,
+            'header': request_profiler.header,
+            'header_enabled': bool(request_profiler.token),
+            'profiles': request_profiler.profiles()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/profiler', methods=['POST'])
+@require_admin
+def arm_profiler():
+    """Perfila as próximas N requisições da API (0 desarma)"""
+    from profiling import request_profiler
+    try:
+        if not request_profiler.enabled:
+            return jsonify({'error': 'Profiler desativado (PROFILER_ENABLED)'}), 409
+        
+        data = request.get_json(silent=True) or {}
+        requests = data.get('requests', 1)
+        
+        if not isinstance(requests, int) or not 0 <= requests <= 100:
+            return jsonify({'error': 'requests deve ser um inteiro entre 0 e 100'}), 400
+        
+        return jsonify({'armed': request_profiler.arm(requests)})
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@api_bp.route('/admin/profiler/<name>', methods=['GET'])
+@require_admin
+def download_profile(name):
+    """Baixa as pilhas de um perfil (formato collapsed, para flamegraph.pl ou speedscope)"""
+    from profiling import request_profiler
+    if not request_profiler.enabled:
+        return jsonify({'error': 'Profiler desativado (PROFILER_ENABLED)'}), 404
+    return send_from_directory(request_profiler.output_dir, name, mimetype='text/plain')
+
 @api_bp.route('/admin/stats', methods=['GET'])
 @require_admin
 def get_admin_stats():
     """Retorna estatísticas para o painel administrativo"""
     try:
-        total_items = PortfolioItem.query.filter_by(is_active=True).count()
-        total_images = PortfolioItem.query.filter_by(type='image', is_active=True).count()
-        total_videos = PortfolioItem.query.filter_by(type='video', is_active=True).count()
-        total_links = PortfolioItem.query.filter_by(type='link', is_active=True).count()
-        total_messages = ContactMessage.query.count()
-        unread_messages = ContactMessage.query.filter_by(is_read=False).count()
-        
-        return jsonify({
+        ttl = current_app.config.get('ADMIN_STATS_CACHE_TTL_SECONDS', 10)
+        
+        stats = admin_stats_cache.get('stats') if ttl else None
+        if stats is not None:
+            return jsonify(stats)
+        
+        # Uma consulta agregada por tabela, com contagens condicionais
+        portfolio = db.session.query(
+            func.count(PortfolioItem.id),
+            func.sum(case((PortfolioItem.type == 'image', 1), else_=0)),
+            func.sum(case((PortfolioItem.type == 'video', 1), else_=0)),
+            func.sum(case((PortfolioItem.type == 'link', 1), else_=0))
+        ).filter(PortfolioItem.is_active == True).one()
+        
+        contact = db.session.query(
+            func.count(ContactMessage.id),
+            func.sum(case((ContactMessage.is_read == False, 1), else_=0))
+        ).one()
+        
+        stats = {
             'portfolio': {
-                'total_items': total_items,
-                'images': total_images,
-                'videos': total_videos,
-                'links': total_links
+                'total_items': portfolio[0],
+                'images': portfolio[1] or 0,
+                'videos': portfolio[2] or 0,
+                'links': portfolio[3] or 0
             },
             'contact': {
-                'total_messages': total_messages,
-                'unread_messages': unread_messages
+                'total_messages': contact[0],
+                'unread_messages': contact[1] or 0
             }
-        })
+        }
+        
+        if ttl:
+            admin_stats_cache.set('stats', stats, ttl=ttl)
+        
+        return jsonify(stats)
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
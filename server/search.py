@@ -0,0 +1,139 @@
+import re
+from sqlalchemy import inspect, text, or_
+from models import db, PortfolioItem
+
+# Pesos das colunas no ranking: título > tags > descrição
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS portfolio_search USING fts5(
+        title, description, tags,
+        content='portfolio_items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS portfolio_search_ai AFTER INSERT ON portfolio_items BEGIN
+        INSERT INTO portfolio_search (rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS portfolio_search_ad AFTER DELETE ON portfolio_items BEGIN
+        INSERT INTO portfolio_search (portfolio_search, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS portfolio_search_au AFTER UPDATE OF title, description, tags ON portfolio_items BEGIN
+        INSERT INTO portfolio_search (portfolio_search, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+        INSERT INTO portfolio_search (rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END""",
+]
+
+# (tipo, nome, DDL): cada objeto só é criado se o catálogo ainda não o tiver, pois o
+# ALTER TABLE pega um lock ACCESS EXCLUSIVE (bloqueia leituras) antes do IF NOT EXISTS
+POSTGRES_SCHEMA = [
+    ('column', 'search_vector', """ALTER TABLE portfolio_items ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('portuguese', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('portuguese', coalesce(tags, '')), 'B') ||
+            setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')
+        ) STORED"""),
+    ('index', 'ix_portfolio_items_search_vector', """CREATE INDEX IF NOT EXISTS ix_portfolio_items_search_vector
+        ON portfolio_items USING GIN (search_vector)"""),
+]
+
+def ensure_search_index():
+    """
+    Cria o índice de busca textual do portfólio, se ainda não existir.
+
+    No SQLite é uma tabela FTS5 mantida por triggers; no PostgreSQL, uma coluna
+    tsvector gerada com índice GIN. Em ambos o índice acompanha insert/update/delete
+    no próprio banco, sem depender das rotas.
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        with db.engine.begin() as connection:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'portfolio_search'"
+            ).first()
+            for statement in SQLITE_SCHEMA:
+                connection.exec_driver_sql(statement)
+            if not exists:
+                # Indexa os itens que já existiam antes da criação da tabela
+                connection.exec_driver_sql("INSERT INTO portfolio_search (portfolio_search) VALUES ('rebuild')")
+        return True
+
+    if dialect == 'postgresql':
+        inspector = inspect(db.engine)
+        existing = {
+            'column': {column['name'] for column in inspector.get_columns('portfolio_items')},
+            'index': {index['name'] for index in inspector.get_indexes('portfolio_items')}
+        }
+        missing = [statement for kind, name, statement in POSTGRES_SCHEMA if name not in existing[kind]]
+        if missing:
+            with db.engine.begin() as connection:
+                for statement in missing:
+                    connection.exec_driver_sql(statement)
+        return True
+
+    return False
+
+def sqlite_match_expression(query):
+    """Converte o texto digitado em uma expressão FTS5 segura (termos em AND, prefixo no último)"""
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(term.replace('"', '')) for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def search_portfolio(query, limit, offset=0, category=None, item_type=None):
+    """
+    Busca itens ativos por título, descrição e tags, em ordem de relevância.
+
+    Retorna (ids na ordem do ranking, há mais resultados).
+    """
+    dialect = db.engine.dialect.name
+    filters = ''
+    params = {'limit': limit + 1, 'offset': offset}
+
+    if category:
+        filters += ' AND p.category = :category'
+        params['category'] = category
+    if item_type:
+        filters += ' AND p.type = :type'
+        params['type'] = item_type
+
+    if dialect == 'sqlite':
+        params['match'] = sqlite_match_expression(query)
+        if not params['match']:
+            return [], False
+        rows = db.session.execute(text(f"""
+            SELECT p.id FROM portfolio_search
+            JOIN portfolio_items p ON p.id = portfolio_search.rowid
+            WHERE portfolio_search MATCH :match AND p.is_active = 1{filters}
+            ORDER BY bm25(portfolio_search, 10.0, 1.0, 5.0), p.id DESC
+            LIMIT :limit OFFSET :offset
+        """), params)
+    elif dialect == 'postgresql':
+        params['query'] = query
+        rows = db.session.execute(text(f"""
+            SELECT p.id FROM portfolio_items p, websearch_to_tsquery('portuguese', :query) q
+            WHERE p.search_vector @@ q AND p.is_active = true{filters}
+            ORDER BY ts_rank_cd(p.search_vector, q) DESC, p.id DESC
+            LIMIT :limit OFFSET :offset
+        """), params)
+    else:
+        # Outros bancos: busca simples por LIKE, sem ranking
+        pattern = f'%{query}%'
+        base = PortfolioItem.query.filter_by(is_active=True).filter(or_(
+            PortfolioItem.title.ilike(pattern),
+            PortfolioItem.description.ilike(pattern),
+            PortfolioItem.tags.ilike(pattern)
+        ))
+        if category:
+            base = base.filter_by(category=category)
+        if item_type:
+            base = base.filter_by(type=item_type)
+        rows = base.with_entities(PortfolioItem.id).order_by(PortfolioItem.id.desc()) \
+            .limit(limit + 1).offset(offset)
+
+    ids = [row[0] for row in rows]
+    return ids[:limit], len(ids) > limit
@@ -0,0 +1,91 @@
+import mimetypes
+import os
+from flask import current_app, request, send_file, abort
+from werkzeug.security import safe_join
+from uploads import UPLOAD_FOLDER, is_content_addressed
+from compression import response_compressor
+
+# Extensões compressíveis para as quais versões .br/.gz pré-comprimidas são procuradas
+COMPRESSIBLE_EXTENSIONS = {'svg', 'json', 'js', 'css', 'txt', 'html', 'xml'}
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Cache de um ano para nomes endereçados por conteúdo (o conteúdo nunca muda)
+IMMUTABLE_MAX_AGE = 31536000
+
+def precompress(path, encoding, suffix):
+    """Grava ao lado do arquivo a sua versão comprimida (escrita atômica)"""
+    if encoding not in response_compressor.encodings or os.path.getsize(path) < response_compressor.min_size:
+        return
+    with open(path, 'rb') as source:
+        data = response_compressor.compress(source.read(), encoding)
+    temp_path = f'{path}{suffix}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(data)
+    os.replace(temp_path, path + suffix)
+
+def is_stale(path, compressed_path):
+    return not os.path.isfile(compressed_path) or os.path.getmtime(compressed_path) < os.path.getmtime(path)
+
+def negotiate_precompressed(path):
+    """
+    Escolhe a versão pré-comprimida aceita pelo cliente, se existir no disco.
+
+    A versão é gerada na primeira requisição que a aceita (ou quando o original
+    é mais novo que ela) e reaproveitada nas seguintes.
+    """
+    if path.rsplit('.', 1)[-1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return path, None
+
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        # O operador 'in' ignora a qualidade: 'gzip;q=0' recusa o gzip explicitamente
+        if request.accept_encodings[encoding] <= 0:
+            continue
+        if response_compressor.enabled and is_stale(path, path + suffix):
+            precompress(path, encoding, suffix)
+        if not is_stale(path, path + suffix):
+            return path + suffix, encoding
+
+    return path, None
+
+def serve_upload(filename):
+    """
+    Serve um arquivo enviado com suporte a Range (206), ETag e If-None-Match (304).
+
+    Nomes endereçados por conteúdo recebem ETag forte igual ao nome e
+    Cache-Control immutable. Com MEDIA_OFFLOAD = 'x-sendfile' ou 'x-accel' a
+    transferência dos bytes é delegada ao proxy (Apache/lighttpd ou nginx).
+    """
+    # Pastas internas (.tmp, .partial) não são públicas
+    if any(part.startswith('.') for part in filename.split('/')):
+        abort(404)
+
+    root = os.path.join(current_app.root_path, UPLOAD_FOLDER)
+    path = safe_join(root, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    immutable = is_content_addressed(filename)
+    served_path, encoding = negotiate_precompressed(path)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = os.path.basename(served_path) if immutable else True
+
+    if current_app.config.get('MEDIA_OFFLOAD') == 'x-accel':
+        # O nginx resolve o caminho interno e cuida de Range e ETag
+        response = current_app.response_class(mimetype=mimetype)
+        prefix = current_app.config.get('MEDIA_ACCEL_PREFIX', '/protected-uploads/')
+        response.headers['X-Accel-Redirect'] = prefix + os.path.relpath(served_path, root).replace(os.sep, '/')
+    else:
+        response = send_file(served_path, mimetype=mimetype, etag=etag, conditional=True)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if path.rsplit('.', 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS:
+        response.vary.add('Accept-Encoding')
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+
+    return response
@@ -0,0 +1,79 @@
+"""
+A listagem do portfólio deve executar um número constante de consultas SQL,
+independente da quantidade de itens e de criadores distintos (sem N+1).
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, User, PortfolioItem, ensure_item_tags
+from cache import response_cache
+from routes import api_bp
+
+def create_test_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['RESPONSE_CACHE_BACKEND'] = 'none'
+    db.init_app(app)
+    response_cache.init_app(app)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    return app
+
+def populate(items):
+    """Cria `items` itens ativos, cada um de um criador diferente"""
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [{
+        'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+        'is_admin': True, 'is_active': True, 'created_at': now
+    } for i in range(items)])
+
+    db.session.execute(PortfolioItem.__table__.insert(), [{
+        'title': f'Item {i}', 'description': 'Descrição', 'tags': json.dumps(['logo']),
+        'category': 'design', 'type': 'image', 'is_active': True, 'created_by': i + 1,
+        'created_at': now - timedelta(seconds=i), 'updated_at': now
+    } for i in range(items)])
+
+    db.session.commit()
+    ensure_item_tags()
+
+def listing_queries(db_path, items, url):
+    """Popula um banco novo com `items` itens e retorna (consultas executadas, corpo) do GET"""
+    app = create_test_app(db_path)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        db.create_all()
+        populate(items)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        response = app.test_client().get(url)
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        db.session.remove()
+
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+@pytest.mark.parametrize('url', [
+    '/api/portfolio?limit=200',
+    '/api/portfolio?limit=200&fields=id,title,creator_name',
+    '/api/portfolio?limit=200&tag=logo',
+])
+def test_listing_query_count_is_constant(tmp_path, url):
+    small, small_body = listing_queries(tmp_path / 'small.db', 5, url)
+    large, large_body = listing_queries(tmp_path / 'large.db', 150, url)
+
+    assert len(small_body['items']) == 5
+    assert len(large_body['items']) == 150
+    assert all(item['creator_name'] for item in large_body['items'])
+    assert small == large
@@ -0,0 +1,372 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+from models import db, PortfolioItem, StoredFile
+
+# Configurações para upload de arquivos
+UPLOAD_FOLDER = 'uploads'
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi', 'webm'}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'webm'}
+
+# Tamanho dos blocos lidos/gravados e limites por tipo de arquivo (em bytes)
+CHUNK_SIZE = 1024 * 1024
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+MAX_VIDEO_SIZE = 500 * 1024 * 1024
+
+# Uploads retomáveis em andamento ficam nesta subpasta até serem concluídos
+PARTIAL_FOLDER = os.path.join(UPLOAD_FOLDER, '.partial')
+# Arquivos em gravação (antes de conhecer o hash) ficam aqui, no mesmo disco do destino
+TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, '.tmp')
+
+# Nomes endereçados por conteúdo: ab/cd/<sha256>.<ext> (relativo a UPLOAD_FOLDER)
+# e as versões derivadas <sha256>_<sufixo>.<ext> geradas a partir dele
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z0-9]+)?\.[a-z0-9]+$')
+
+class UploadError(Exception):
+    """Erro de upload com o status HTTP que deve ser devolvido ao cliente"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def max_upload_size(filename):
+    """Retorna o tamanho máximo permitido para o arquivo, de acordo com a extensão"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return MAX_VIDEO_SIZE
+    return MAX_IMAGE_SIZE
+
+def validate_upload(filename, declared_size=None):
+    """Valida nome e tamanho declarado antes de ler qualquer byte do corpo"""
+    if not filename:
+        raise UploadError('Nenhum arquivo selecionado')
+
+    if not allowed_file(filename):
+        raise UploadError('Tipo de arquivo não permitido')
+
+    limit = max_upload_size(filename)
+    if declared_size is not None and declared_size > limit:
+        raise UploadError(f'Arquivo excede o limite de {limit // (1024 * 1024)} MB', 413)
+
+    return secure_filename(filename), limit
+
+def content_path(sha256, extension):
+    """Caminho endereçado por conteúdo, distribuído em subpastas pelos primeiros bytes do hash"""
+    return os.path.join(UPLOAD_FOLDER, sha256[:2], sha256[2:4], f'{sha256}.{extension}')
+
+def is_content_addressed(filename):
+    """Indica se o nome (relativo a UPLOAD_FOLDER) é imutável, podendo ser cacheado para sempre"""
+    return bool(CONTENT_ADDRESSED_NAME.match(filename))
+
+def temp_upload_path():
+    """Gera um caminho temporário para gravar um upload antes de conhecer o hash"""
+    os.makedirs(TEMP_FOLDER, exist_ok=True)
+    return os.path.join(TEMP_FOLDER, uuid.uuid4().hex)
+
+def store_content(temp_path, sha256, filename, size):
+    """
+    Move um arquivo já gravado para o armazenamento endereçado por conteúdo.
+
+    Se o mesmo conteúdo já existe, o temporário é descartado e o caminho existente
+    é reaproveitado. Retorna (caminho, duplicado).
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    file_path = content_path(sha256, extension)
+    duplicate = os.path.exists(file_path)
+
+    if duplicate:
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
+
+    if not StoredFile.query.filter_by(path=file_path).first():
+        db.session.add(StoredFile(sha256=sha256, path=file_path, size=size))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker registrou o mesmo conteúdo ao mesmo tempo
+            db.session.rollback()
+
+    return file_path, duplicate
+
+def update_references(*paths):
+    """
+    Recalcula a contagem de referências dos arquivos informados.
+
+    A contagem considera file_path e thumbnail_path de todos os itens (inclusive os
+    inativos, que podem ser reativados) e é recalculada, não incrementada, para não
+    acumular desvios.
+    """
+    paths = {path for path in paths if path}
+    if not paths:
+        return
+
+    for stored in StoredFile.query.filter(StoredFile.path.in_(paths)).all():
+        stored.ref_count = PortfolioItem.query.filter(or_(
+            PortfolioItem.file_path == stored.path,
+            PortfolioItem.thumbnail_path == stored.path
+        )).count()
+
+    db.session.commit()
+
+def collect_garbage(grace_hours=24):
+    """Remove arquivos sem referências há mais de grace_hours; retorna os caminhos removidos"""
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    candidates = StoredFile.query.filter(StoredFile.ref_count == 0, StoredFile.created_at < cutoff).all()
+
+    update_references(*[stored.path for stored in candidates])
+
+    removed = []
+    for stored in candidates:
+        if stored.ref_count > 0:
+            continue
+        derived = [stored.thumbnail_path] + [variant['path'] for variant in json.loads(stored.variants or '[]')]
+        # Versões pré-comprimidas geradas na entrega (serving.py)
+        derived += [stored.path + suffix for suffix in ('.br', '.gz')]
+        for path in [stored.path] + derived:
+            if path and os.path.exists(path):
+                os.remove(path)
+        db.session.delete(stored)
+        removed.append(stored.path)
+
+    db.session.commit()
+    return removed
+
+def collect_partial_uploads(max_age_hours=24):
+    """Remove sessões de upload retomável sem atividade há mais de max_age_hours; retorna os ids"""
+    if not os.path.isdir(PARTIAL_FOLDER):
+        return []
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = []
+    for entry in os.scandir(PARTIAL_FOLDER):
+        upload_id, extension = os.path.splitext(entry.name)
+        if extension != '.json':
+            continue
+        part_path = os.path.join(PARTIAL_FOLDER, upload_id + '.part')
+        # A atividade é o último bloco gravado (ou a criação da sessão)
+        last_activity = max(entry.stat().st_mtime,
+                            os.path.getmtime(part_path) if os.path.exists(part_path) else 0)
+        if last_activity >= cutoff:
+            continue
+        try:
+            resumable_uploads.abort(upload_id)
+        except UploadError:
+            # Concluída, cancelada ou com um bloco em gravação neste momento
+            continue
+        removed.append(upload_id)
+
+    return removed
+
+def stream_to_file(stream, file_path, limit, hasher=None, mode='wb'):
+    """
+    Copia um stream para o disco em blocos de CHUNK_SIZE, calculando o hash no caminho.
+
+    O limite é verificado a cada bloco, então um corpo maior que o declarado é
+    interrompido sem ser lido por inteiro. Retorna (bytes gravados, hasher).
+    """
+    hasher = hasher or hashlib.sha256()
+    written = 0
+
+    try:
+        with open(file_path, mode) as output:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise UploadError(f'Arquivo excede o limite de {limit // (1024 * 1024)} MB', 413)
+                hasher.update(chunk)
+                output.write(chunk)
+    except UploadError:
+        if mode == 'wb' and os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return written, hasher
+
+def save_upload(stream, filename, declared_size=None):
+    """Grava um upload completo (multipart ou corpo bruto) e retorna seus metadados"""
+    filename, limit = validate_upload(filename, declared_size)
+
+    temp_path = temp_upload_path()
+    size, hasher = stream_to_file(stream, temp_path, limit)
+    file_path, duplicate = store_content(temp_path, hasher.hexdigest(), filename, size)
+
+    return {
+        'file_path': file_path,
+        'original_filename': filename,
+        'size': size,
+        'sha256': hasher.hexdigest(),
+        'duplicate': duplicate
+    }
+
+class ResumableUploads:
+    """
+    Uploads retomáveis em blocos: o cliente cria uma sessão, envia os blocos
+    informando o offset e, se a conexão cair, consulta o offset atual e continua.
+
+    O estado fica em disco (PARTIAL_FOLDER), então sobrevive a reinícios e é
+    compartilhado entre workers da mesma máquina. O hash incremental é mantido em
+    memória; se o upload for retomado em outro processo, ele é recalculado no final.
+    Cada bloco é gravado com um flock exclusivo no arquivo parcial, então um
+    reenvio do mesmo offset (cliente que desistiu por timeout) recebe 409 em vez
+    de intercalar bytes com o bloco ainda em gravação.
+    """
+
+    def __init__(self):
+        self._hashers = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError('Upload não encontrado', 404)
+        base = os.path.join(PARTIAL_FOLDER, upload_id)
+        return base + '.json', base + '.part'
+
+    def _load(self, upload_id):
+        meta_path, part_path = self._paths(upload_id)
+        if not os.path.exists(meta_path):
+            raise UploadError('Upload não encontrado', 404)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return meta
+
+    @contextmanager
+    def _locked(self, part_path):
+        """Lock exclusivo (entre threads e processos) no arquivo parcial, sem esperar"""
+        try:
+            fd = os.open(part_path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise UploadError('Upload não encontrado', 404)
+
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Outro bloco deste upload está sendo gravado', 409)
+            yield
+        finally:
+            # Fechar o descritor libera o lock
+            os.close(fd)
+
+    def create(self, filename, size):
+        """Abre uma sessão de upload para um arquivo de tamanho conhecido"""
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Tamanho do arquivo inválido')
+
+        filename, _ = validate_upload(filename, size)
+        os.makedirs(PARTIAL_FOLDER, exist_ok=True)
+
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        meta = {'upload_id': upload_id, 'filename': filename, 'size': size}
+
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        open(part_path, 'wb').close()
+
+        with self._lock:
+            self._hashers[upload_id] = (0, hashlib.sha256())
+
+        return dict(meta, offset=0, chunk_size=CHUNK_SIZE)
+
+    def status(self, upload_id):
+        """Retorna o estado da sessão, incluindo o offset a partir do qual continuar"""
+        meta = self._load(upload_id)
+        return dict(meta, chunk_size=CHUNK_SIZE)
+
+    def append(self, upload_id, offset, stream):
+        """
+        Acrescenta um bloco na posição informada.
+
+        Retorna o estado atualizado; quando o último byte chega, o arquivo é movido
+        para a pasta de uploads e o estado inclui file_path e sha256.
+        """
+        _, part_path = self._paths(upload_id)
+        with self._locked(part_path):
+            # O offset é lido só depois do lock: um bloco concorrente já terminou de gravar
+            meta = self._load(upload_id)
+            return self._append(meta, part_path, offset, stream)
+
+    def _append(self, meta, part_path, offset, stream):
+        upload_id = meta['upload_id']
+        if offset != meta['offset']:
+            raise UploadError(f"Offset inválido: esperado {meta['offset']}", 409)
+
+        with self._lock:
+            cached = self._hashers.pop(upload_id, None)
+        hasher = cached[1] if cached and cached[0] == offset else None
+
+        remaining = meta['size'] - offset
+        try:
+            written, chunk_hasher = stream_to_file(stream, part_path, remaining,
+                                                   hasher=hasher or hashlib.sha256(), mode='ab')
+        except UploadError as e:
+            if e.status_code == 413:
+                raise UploadError('Bloco excede o tamanho declarado do arquivo', 413)
+            raise
+        offset += written
+
+        if offset < meta['size']:
+            if hasher is not None:
+                with self._lock:
+                    self._hashers[upload_id] = (offset, chunk_hasher)
+            return dict(meta, offset=offset, complete=False)
+
+        return self._finish(meta, part_path, chunk_hasher if hasher is not None else None)
+
+    def _finish(self, meta, part_path, hasher):
+        if hasher is None:
+            hasher = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+
+        file_path, duplicate = store_content(part_path, hasher.hexdigest(), meta['filename'], meta['size'])
+        os.remove(self._paths(meta['upload_id'])[0])
+
+        return {
+            'upload_id': meta['upload_id'],
+            'file_path': file_path,
+            'original_filename': meta['filename'],
+            'size': meta['size'],
+            'offset': meta['size'],
+            'sha256': hasher.hexdigest(),
+            'duplicate': duplicate,
+            'complete': True
+        }
+
+    def abort(self, upload_id):
+        """Cancela a sessão e remove os dados parciais"""
+        meta_path, part_path = self._paths(upload_id)
+        if not os.path.exists(meta_path):
+            raise UploadError('Upload não encontrado', 404)
+
+        with self._locked(part_path):
+            with self._lock:
+                self._hashers.pop(upload_id, None)
+            for path in (meta_path, part_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+# Instância global dos uploads retomáveis
+resumable_uploads = ResumableUploads()